@@ -1,20 +1,90 @@
 import os
 import sys
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response
 import io
+import json
 import platform
+import select
+import socket
+import threading
+import unicodedata
+from collections import defaultdict
+from contextlib import contextmanager
+from werkzeug.serving import is_running_from_reloader
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from main import AquesSynthesizer
-from text_to_ja import ChineseToHiragana
+from text_to_ja import ChineseToHiragana, split_sentences
+from user_dict import UserDictionary
+from engine_pool import EnginePool
+from engine_host import RemoteAquesSynthesizer
+from audio_cache import DirectoryAudioStore, cache_key
+from scheduler import AdmissionScheduler, AdmissionRejected, PRIORITY_INTERACTIVE
+from stream_session import StreamingSession, WINDOW
+from batcher import MicroBatcher
+from deadline import Deadline, DeadlineExceeded
+from assembler import MAX_SEGMENT_LENGTH
+from wav_utils import concat_wavs
+from template import TemplateSynthesizer
+
+try:
+    from flask_sock import Sock  # 可选依赖，用于 /stream 流式合成
+except ImportError:
+    Sock = None
 
 app = Flask(__name__)
+sock = Sock(app) if Sock is not None else None
 
 AQTK1_BASE = '.\\aqtk1'
 AQTK2_BASE = '.\\aqtk2'
 DIC_DIR = '.\\aq_dic'
+USER_DICT_PATH = '.\\user_dict.json'  # 由 UserDictionary.save() 生成的预编译用户词典
+# 启动时预加载并预热的音色，可通过环境变量 AQ_PRELOAD_VOICES (逗号分隔) 覆盖
+PRELOAD_VOICES = [v.strip() for v in os.environ.get('AQ_PRELOAD_VOICES', 'aq_yukkuri.phont,f1').split(',') if v.strip()]
+# 持久化音频缓存目录 (可放在多台主机共享的网络文件系统上)，为空时不启用
+CACHE_DIR = os.environ.get('AQ_CACHE_DIR', '')
+CACHE_MAX_MB = int(os.environ.get('AQ_CACHE_MAX_MB', '1024'))
+# 是否去除首尾静音并将中间停顿压缩到 AQ_MAX_PAUSE_MS 毫秒以内
+TRIM_SILENCE = os.environ.get('AQ_TRIM_SILENCE', '0') == '1'
+MAX_PAUSE_MS = int(os.environ.get('AQ_MAX_PAUSE_MS', '300'))
+# GET /tts 的结果由输入唯一确定，可被 CDN 和浏览器长期缓存。ETag 包含音色文件和用户词典的指纹以及静音压缩设置，
+# 这些变化后自动失效；合成流程本身改变输出时需修改此版本号
+TTS_VERSION = '3'
+TTS_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 准入调度：全局并发上限、单客户端并发配额、每个优先级的最大排队数和最长排队时间 (秒)
+MAX_CONCURRENCY = int(os.environ.get('AQ_MAX_CONCURRENCY', '4'))
+CLIENT_QUOTA = int(os.environ.get('AQ_CLIENT_QUOTA', '2'))
+MAX_QUEUE = int(os.environ.get('AQ_MAX_QUEUE', '256'))
+QUEUE_TIMEOUT = float(os.environ.get('AQ_QUEUE_TIMEOUT', '30'))
+# 按音色的自适应微批处理：同一音色的请求在几毫秒内合并，在其常驻引擎上连续执行。
+# AQ_BATCH_WORKERS 为同时执行的批数，AQ_BATCH_BUDGET_MS 为单个请求的延迟预算
+MICRO_BATCH = os.environ.get('AQ_MICRO_BATCH', '1') == '1'
+BATCH_WORKERS = int(os.environ.get('AQ_BATCH_WORKERS', str(MAX_CONCURRENCY)))
+BATCH_BUDGET_MS = float(os.environ.get('AQ_BATCH_BUDGET_MS', '200'))
+# 请求未通过 X-Deadline-Ms 请求头或 deadline_ms 参数指定截止时间时使用的默认值 (毫秒)，0 表示不限制
+DEFAULT_DEADLINE_MS = int(os.environ.get('AQ_DEFAULT_DEADLINE_MS', '0'))
+# POST /koe 未指定 voice 时使用的音色 (只用到其 AqKanji2Koe 句柄)
+DEFAULT_VOICE = PRELOAD_VOICES[0] if PRELOAD_VOICES else 'aq_yukkuri.phont'
+# POST /koe 单次请求允许的最大文本条数
+MAX_KOE_BATCH = 256
+# /synthesize、/tts 的文本 (或 Koe) 以及 /template 渲染结果允许的最大字符数
+MAX_TEXT_LENGTH = int(os.environ.get('AQ_MAX_TEXT_LENGTH', '2000'))
+# 设为 1 时引擎运行在独立的 (32 位) 宿主进程中，API 进程可以使用 64 位 Python；
+# 宿主使用的解释器由 AQ_HOST_PYTHON 指定
+ENGINE_HOST = os.environ.get('AQ_ENGINE_HOST', '0') == '1'
+# 设为 1 时所有音色都使用不依赖 DLL 的桩引擎，用于基准测试和压测
+STUB_ENGINE = os.environ.get('AQ_STUB_ENGINE', '0') == '1'
+DEBUG = True
+
+# 预编译的用户词典只在启动时加载一次
+converter = ChineseToHiragana(
+    user_dict=UserDictionary.load(USER_DICT_PATH) if os.path.isfile(USER_DICT_PATH) else None
+)
+USER_DICT_VERSION = converter.user_dict.digest() if converter.user_dict else None
 
 
 def get_engine_and_paths(voice):
+    if STUB_ENGINE:
+        return 'stub', AQTK2_BASE
     if voice.endswith('.phont'):
         engine = 'aq2'
         dll_base = AQTK2_BASE
@@ -24,6 +94,54 @@ def get_engine_and_paths(voice):
     return engine, dll_base
 
 
+audio_cache = DirectoryAudioStore(CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024) if CACHE_DIR else None
+engine_pool = EnginePool(get_engine_and_paths, DIC_DIR, cache=audio_cache,
+                         factory=RemoteAquesSynthesizer if ENGINE_HOST else AquesSynthesizer,
+                         trim_silence=TRIM_SILENCE, max_pause_ms=MAX_PAUSE_MS)
+scheduler = AdmissionScheduler(capacity=MAX_CONCURRENCY, client_quota=CLIENT_QUOTA, max_queue=MAX_QUEUE)
+batcher = MicroBatcher(engine_pool, workers=BATCH_WORKERS, latency_budget_ms=BATCH_BUDGET_MS) if MICRO_BATCH else None
+# 在应用初始化时开始预热，WSGI 服务器和导入 api 的脚本 (soak.py、perf.py) 也会预热并最终就绪；
+# 只有 debug 模式下 reloader 的父进程不处理请求，跳过预热
+if __name__ != '__main__' or not DEBUG or is_running_from_reloader():
+    engine_pool.start_preload(PRELOAD_VOICES)
+# 模板合成的静态片段缓存，所有音色共用
+templates = TemplateSynthesizer(converter, max_length=MAX_TEXT_LENGTH)
+# 因超过截止时间或客户端断开而放弃的请求数 (按放弃时所处的阶段)，以及因此未合成的文本段数
+abandoned = {'requests': 0, 'segments': 0, 'stages': defaultdict(int)}
+abandoned_lock = threading.Lock()
+
+
+def record_abandoned(stage, segments=0):
+    with abandoned_lock:
+        abandoned['requests'] += 1
+        abandoned['segments'] += segments
+        abandoned['stages'][stage or 'unknown'] += 1
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # 负载均衡的就绪探针：预热完成前返回 503
+    if engine_pool.is_ready():
+        return {'ready': True}
+    return {'ready': False}, 503
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify(engine_pool.health())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    result = {'scheduler': scheduler.stats()}
+    if batcher is not None:
+        result['batcher'] = batcher.stats()
+    result['templates'] = templates.stats()
+    with abandoned_lock:
+        result['abandoned'] = dict(abandoned, stages=dict(abandoned['stages']))
+    return jsonify(result)
+
+
 @app.route('/voices', methods=['GET'])
 def list_voices():
     voices = []
@@ -42,45 +160,386 @@ def list_voices():
     return jsonify(voices)
 
 
+def get_client_and_priority(data=None):
+    """客户端标识取自 X-Client-Id 请求头 (默认为来源地址)，优先级取自 X-Priority 请求头或请求参数。"""
+    client = request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+    priority = request.headers.get('X-Priority') or (data or {}).get('priority') or PRIORITY_INTERACTIVE
+    return client, priority
+
+
+def client_disconnect_probe():
+    """
+    返回检测客户端是否已断开的函数。WSGI 没有断开通知，这里只能在 Werkzeug 服务器下
+    查看连接是否已被对方关闭 (可读且读到 EOF)；其他服务器下返回 None，只依靠截止时间。
+    """
+    conn = request.environ.get('werkzeug.socket')
+    if conn is None:
+        return None
+
+    def probe():
+        try:
+            readable, _, _ = select.select([conn], [], [], 0)
+            return bool(readable) and conn.recv(1, socket.MSG_PEEK) == b''
+        except ValueError:
+            # 例如 TLS 连接不支持 MSG_PEEK，无法判断
+            return False
+        except OSError:
+            return True
+
+    return probe
+
+
+def get_deadline_ms(data=None, use_header: bool = True) -> float:
+    """
+    截止时间取自 X-Deadline-Ms 请求头或 deadline_ms 参数 (从收到请求起的毫秒数)，0 表示不限制。
+    :param use_header: 为 False 时忽略请求头，只使用参数和默认值。
+    """
+    value = (request.headers.get('X-Deadline-Ms') if use_header else None) \
+        or (data or {}).get('deadline_ms') or DEFAULT_DEADLINE_MS
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的截止时间: {value}")
+
+
+def get_deadline(data=None):
+    timeout_ms = get_deadline_ms(data)
+    return Deadline(timeout_ms / 1000 if timeout_ms > 0 else None, probe=client_disconnect_probe())
+
+
+def admission_timeout(deadline=None):
+    """排队等待的最长时间，不超过请求剩余的截止时间。"""
+    if deadline is None or deadline.remaining() is None:
+        return QUEUE_TIMEOUT
+    return max(0.0, min(QUEUE_TIMEOUT, deadline.remaining()))
+
+
+@contextmanager
+def admit(client, voice, priority, deadline=None):
+    """经过准入调度；启用微批处理时，被接纳后向批处理器声明该音色即将提交一个请求。"""
+    with scheduler.admit(client, voice, priority, timeout=admission_timeout(deadline)):
+        if batcher is None:
+            yield
+        else:
+            with batcher.expect(voice):
+                yield
+
+
+def run_on_engine(voice, run):
+    """在该音色的常驻合成器上执行 run(synth)，启用微批处理时经过批处理器。"""
+    if batcher is not None:
+        return batcher.submit(voice, run)
+    with engine_pool.acquire(voice) as synth:
+        return run(synth)
+
+
+def synthesize_text(voice, text, speed, pitch, volume, client, priority, koe=None, deadline=None,
+                    segmented=None):
+    """
+    经过准入调度后，转换日语发音并使用常驻引擎合成。
+    指定 koe (语音记号列) 时跳过发音转换和 AqKanji2Koe，直接合成。
+    deadline 有时间限制时，文本按句转换和合成后拼接 (转换后超过引擎安全长度的句子再切分)，
+    在各阶段和各段之间检查，超时或客户端断开后放弃剩余的工作并计入 /metrics；
+    没有时间限制时整段文本一次合成。
+    :param segmented: 显式指定是否分段合成，None 表示由 deadline 决定。
+    """
+    if segmented is None:
+        segmented = deadline is not None and deadline.remaining() is not None
+    segmented = segmented and not koe
+    if koe:
+        sentences = [koe]
+    elif segmented:
+        sentences = split_sentences(text, len(text)) or [text]
+    else:
+        sentences = [text]
+    # 每句切分出的引擎输入段，转换之前每句按一段计
+    segments = [[s] for s in sentences]
+    done = [0]
+    try:
+        with admit(client, voice, priority, deadline):
+            if not koe:
+                segments = []
+                for sentence in sentences:
+                    ja = converter.convert(sentence, deadline)
+                    # 引擎的长度限制作用于转换后的日文文本
+                    segments.append((split_sentences(ja, MAX_SEGMENT_LENGTH) or [ja]) if segmented else [ja])
+
+            def run(synth):
+                wavs = []
+                for parts in segments:
+                    part_wavs = []
+                    for part in parts:
+                        if koe:
+                            part_wavs.append(synth.synthesize(koe=part, speed=speed, pitch=pitch, volume=volume,
+                                                              deadline=deadline))
+                        else:
+                            part_wavs.append(synth.synthesize(part, speed=speed, pitch=pitch, volume=volume,
+                                                              deadline=deadline))
+                        done[0] += 1
+                    # 同一句切分出的各段之间不插入静音
+                    wavs.append(concat_wavs(part_wavs))
+                # 去除静音后每段首尾的停顿已被压缩，句间插入与单次合成时相同上限的停顿
+                return concat_wavs(wavs, gap_ms=MAX_PAUSE_MS if TRIM_SILENCE else 0)
+
+            return run_on_engine(voice, run)
+    except AdmissionRejected:
+        if deadline is not None and deadline.expired():
+            record_abandoned('queue', len(segments))
+            raise DeadlineExceeded('queue', deadline.cancelled)
+        raise
+    except DeadlineExceeded as e:
+        record_abandoned(e.stage, sum(map(len, segments)) - done[0])
+        raise
+
+
+@app.route('/koe', methods=['POST'])
+def convert_koe():
+    """只进行发音转换，返回语音记号列 (Koe)。支持 text (单条) 或 texts (批量)。"""
+    data = request.json or {}
+    texts = data.get('texts')
+    single = texts is None
+    if single:
+        texts = [data.get('text')]
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) and t for t in texts):
+        return {'error': '缺少 text 或 texts 参数'}, 400
+    if len(texts) > MAX_KOE_BATCH:
+        return {'error': f'texts 最多 {MAX_KOE_BATCH} 条'}, 400
+    voice = data.get('voice') or DEFAULT_VOICE
+
+    client, priority = get_client_and_priority(data)
+    done = 0
+    try:
+        deadline = get_deadline(data)
+        with scheduler.admit(client, voice, priority, timeout=admission_timeout(deadline)):
+            ja_texts = [converter.convert(t, deadline) for t in texts]
+            koes = []
+            with engine_pool.acquire(voice) as synth:
+                for t in ja_texts:
+                    deadline.check('koe')
+                    koes.append(synth.convert_to_koe(t))
+                    done += 1
+    except DeadlineExceeded as e:
+        record_abandoned(e.stage, len(texts) - done)
+        return {'error': str(e)}, 504
+    except AdmissionRejected as e:
+        if deadline.expired():
+            record_abandoned('queue', len(texts))
+            return {'error': str(DeadlineExceeded('queue', deadline.cancelled))}, 504
+        return {'error': f'服务繁忙: {str(e)}'}, 429
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f'转换失败: {str(e)}'}, 500
+    if single:
+        return {'koe': koes[0]}
+    return {'koe': koes}
+
+
+def clamp(value, default, minv, maxv):
+    try:
+        return max(minv, min(maxv, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+@app.route('/tts', methods=['GET'])
+def tts():
+    # 规范化输入，保证相同的请求得到相同的 ETag
+    voice = request.args.get('voice', '').strip()
+    text = unicodedata.normalize('NFKC', request.args.get('text', '')).strip()
+    speed = clamp(request.args.get('speed'), 100, 50, 300)
+    pitch = clamp(request.args.get('pitch'), 100, 50, 200)
+    volume = clamp(request.args.get('volume'), 100, 0, 300)
+
+    if not text or not voice:
+        return {'error': '缺少 text 或 voice 参数'}, 400
+    if len(text) > MAX_TEXT_LENGTH:
+        return {'error': f'text 最多 {MAX_TEXT_LENGTH} 个字符'}, 400
+
+    client, priority = get_client_and_priority(request.args)
+    try:
+        deadline = get_deadline(request.args)
+        # 分段合成的输出与一次合成不同，是否分段只能取决于 URL 中的参数，不能取决于 X-Deadline-Ms 请求头，
+        # 否则共享缓存会把一种结果返回给另一种请求；请求头中的截止时间只用于放弃超时的请求
+        segmented = get_deadline_ms(request.args, use_header=False) > 0
+        etag = cache_key('tts', TTS_VERSION, engine_pool.voice_version(voice), USER_DICT_VERSION,
+                         TRIM_SILENCE, MAX_PAUSE_MS if TRIM_SILENCE else None, segmented,
+                         voice, text, speed, pitch, volume)
+        if request.if_none_match.contains(etag):
+            # 客户端或边缘缓存已有该音频，无需合成
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = TTS_CACHE_CONTROL
+            return response
+        wav = synthesize_text(voice, text, speed, pitch, volume, client, priority, deadline=deadline,
+                              segmented=segmented)
+    except DeadlineExceeded as e:
+        return {'error': str(e)}, 504
+    except AdmissionRejected as e:
+        return {'error': f'服务繁忙: {str(e)}'}, 429
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f'合成失败: {str(e)}'}, 500
+
+    response = Response(wav, mimetype='audio/wav')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = TTS_CACHE_CONTROL
+    # 处理 If-Range / Range 请求，支持播放器拖动进度
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(wav))
+
+
 @app.route('/synthesize', methods=['POST'])
 def synthesize_audio():
     data = request.json
+    if not isinstance(data, dict):
+        return {'error': '请求体必须是 JSON 对象'}, 400
     text = data.get('text')
+    koe = data.get('koe')
     voice = data.get('voice')
-    speed = int(data.get('speed', 100))
-    pitch = int(data.get('pitch', 100))
-    volume = int(data.get('volume', 100))
+    try:
+        speed = int(data.get('speed', 100))
+        pitch = int(data.get('pitch', 100))
+        volume = int(data.get('volume', 100))
+    except (TypeError, ValueError):
+        return {'error': 'speed、pitch、volume 必须是整数'}, 400
 
-    if not text or not voice:
-        return {'error': '缺少 text 或 voice 参数'}, 400
-    # 转换日语发音
-    text = ChineseToHiragana().convert(text)
+    if not all(value is None or isinstance(value, str) for value in (text, koe, voice)):
+        return {'error': 'text、koe 和 voice 必须是字符串'}, 400
+    if not ((text and text.strip()) or koe) or not voice:
+        return {'error': '缺少 text (或 koe) 或 voice 参数'}, 400
+    if len(text or koe) > MAX_TEXT_LENGTH:
+        return {'error': f'text 最多 {MAX_TEXT_LENGTH} 个字符'}, 400
+
+    client, priority = get_client_and_priority(data)
+    try:
+        wav = synthesize_text(voice, text, speed, pitch, volume, client, priority, koe=koe,
+                              deadline=get_deadline(data))
+        wav_io = io.BytesIO(wav)
+        wav_io.seek(0)
+        prefix = AquesSynthesizer.get_prefix(text or koe)
+        filename = f"{prefix}.wav"
+        return send_file(
+            wav_io,
+            mimetype='audio/wav',
+            as_attachment=True,
+            download_name=filename
+        )
+    except DeadlineExceeded as e:
+        return {'error': str(e)}, 504
+    except AdmissionRejected as e:
+        return {'error': f'服务繁忙: {str(e)}'}, 429
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f'合成失败: {str(e)}'}, 500
+
+
+def stream(ws):
+    """
+    WebSocket 流式合成：客户端先发送 {"type": "start", "voice", "speed", "pitch", "volume", "window"}，
+    之后逐段发送 {"type": "text", "text"}，可用 flush / cancel / ack / end 控制，
+    服务器每凑满一句立即合成并以二进制帧返回 PCM 数据，消息格式见 stream_session.StreamingSession。
+    """
+    send_lock = threading.Lock()
+
+    def send(message):
+        # 后台合成线程和本线程都会发送消息
+        with send_lock:
+            ws.send(json.dumps(message, ensure_ascii=False) if isinstance(message, dict) else message)
+
+    try:
+        start = json.loads(ws.receive())
+    except (TypeError, ValueError):
+        start = None
+    if not isinstance(start, dict):
+        start = {}
+    voice = start.get('voice')
+    if start.get('type') != 'start' or not isinstance(voice, str) or not voice:
+        send({'type': 'error', 'error': '第一条消息必须是包含 voice 的 start 消息'})
+        return
+    speed = clamp(start.get('speed'), 100, 50, 300)
+    pitch = clamp(start.get('pitch'), 100, 50, 200)
+    volume = clamp(start.get('volume'), 100, 0, 300)
+    client, priority = get_client_and_priority(start)
+    try:
+        # 会话开始前确保该音色的引擎已加载并预热，首句不必等待加载
+        with engine_pool.acquire(voice):
+            pass
+    except Exception as e:
+        send({'type': 'error', 'error': f'引擎加载失败: {str(e)}'})
+        return
+
+    session = StreamingSession(
+        lambda sentence: synthesize_text(voice, sentence, speed, pitch, volume, client, priority),
+        send,
+        window=clamp(start.get('window'), WINDOW, 0, 1024)
+    )
+    send({'type': 'ready'})
+    try:
+        while not session.finished.is_set():
+            data = ws.receive(timeout=1)
+            if data is None:
+                continue
+            try:
+                if isinstance(data, bytes):
+                    raise ValueError('不支持二进制消息')
+                session.handle(json.loads(data))
+            except ValueError as e:
+                send({'type': 'error', 'error': str(e)})
+    finally:
+        # 客户端断开时丢弃剩余的工作
+        session.close()
+
+
+if sock is not None:
+    sock.route('/stream')(stream)
+
+
+@app.route('/template', methods=['POST'])
+def synthesize_template():
+    """
+    模板合成：请求体为 {"template": "ただいまの時刻は{time}です", "values": {"time": ...}, "voice", ...}。
+    静态部分合成一次后缓存，每次请求只合成插槽中的动态文本并拼接。
+    """
+    data = request.json or {}
+    template = data.get('template')
+    values = data.get('values') or {}
+    voice = data.get('voice')
+    speed = clamp(data.get('speed'), 100, 50, 300)
+    pitch = clamp(data.get('pitch'), 100, 50, 200)
+    volume = clamp(data.get('volume'), 100, 0, 300)
 
-    engine, dll_base = get_engine_and_paths(voice)
+    if not isinstance(template, str) or not template or not voice:
+        return {'error': '缺少 template 或 voice 参数'}, 400
+    if not isinstance(values, dict):
+        return {'error': 'values 必须是对象'}, 400
 
+    client, priority = get_client_and_priority(data)
     try:
-        with AquesSynthesizer(
-            engine=engine,
-            voice=voice,
-            dll_base=dll_base,
-            dic_dir=DIC_DIR
-        ) as synth:
-            wav = synth.synthesize(text, speed=speed, pitch=pitch, volume=volume)
-            wav_io = io.BytesIO(wav)
-            wav_io.seek(0)
-            prefix = AquesSynthesizer.get_prefix(data.get('text', 'audio'))
-            filename = f"{prefix}.wav"
-            return send_file(
-                wav_io,
-                mimetype='audio/wav',
-                as_attachment=True,
-                download_name=filename
+        deadline = get_deadline(data)
+        with admit(client, voice, priority, deadline):
+            wav = run_on_engine(
+                voice, lambda synth: templates.render(synth, template, values, speed, pitch, volume, deadline)
             )
+    except DeadlineExceeded as e:
+        record_abandoned(e.stage)
+        return {'error': str(e)}, 504
+    except AdmissionRejected as e:
+        if deadline.expired():
+            record_abandoned('queue')
+            return {'error': str(DeadlineExceeded('queue', deadline.cancelled))}, 504
+        return {'error': f'服务繁忙: {str(e)}'}, 429
+    except ValueError as e:
+        return {'error': str(e)}, 400
     except Exception as e:
         return {'error': f'合成失败: {str(e)}'}, 500
+    return Response(wav, mimetype='audio/wav')
 
 
 if __name__ == '__main__':
-    if platform.architecture()[0] != '32bit':
-        print("警告：请使用 32 位 Python 环境以兼容 DLL。")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if sock is None:
+        print("警告：未安装 flask-sock，WebSocket 流式合成接口 /stream 不可用。")
+    if platform.architecture()[0] != '32bit' and not ENGINE_HOST:
+        print("警告：请使用 32 位 Python 环境以兼容 DLL，或设置 AQ_ENGINE_HOST=1 在 32 位宿主进程中运行引擎。")
+    app.run(host='0.0.0.0', port=5000, debug=DEBUG)
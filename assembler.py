@@ -0,0 +1,125 @@
+import os
+import sys
+import struct
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+from text_to_ja import ChineseToHiragana, split_sentences
+from wav_utils import read_wav, make_header, silence
+
+# AquesTalk 单次输入的安全长度 (字符数)，过长的文本会被自动切分
+MAX_SEGMENT_LENGTH = 100
+
+
+class LongFormAssembler:
+    """
+    长文本拼接器：将多段合成结果的 PCM 数据依次追加写入同一个 WAV 文件。
+    每次只在内存中保留一段音频，RIFF 头部的长度字段在 close() 时统一回填，
+    因此内存占用与输出时长无关。通过 'with' 语句使用可以确保文件被正确收尾。
+    """
+
+    def __init__(self, synth: AquesSynthesizer, output_path: str, gap_ms: int = 300,
+                 max_segment_length: int = MAX_SEGMENT_LENGTH):
+        """
+        :param synth: 已初始化的 AquesSynthesizer 实例。
+        :param output_path: 输出 WAV 文件路径。
+        :param gap_ms: 段与段之间插入的静音时长 (毫秒)。
+        :param max_segment_length: 单段文本的最大字符数，超过时自动切分。
+        """
+        self.synth = synth
+        self.gap_ms = gap_ms
+        self.max_segment_length = max_segment_length
+        self.params = None
+        self.data_size = 0
+        self.segment_count = 0
+        self._file = open(output_path, 'wb')
+
+    def add_text(self, text: str, speed: int = 100, pitch: int = 100, volume: int = 100, gap_ms: int = None) -> int:
+        """
+        合成一段日文文本并追加到输出文件，超长文本会按句切分后逐段合成。
+
+        :param text: 要合成的日文文本。
+        :param gap_ms: 本段之前的静音时长，默认使用构造时的 gap_ms。
+        :return: 实际写入的段数。
+        """
+        segments = split_sentences(text, self.max_segment_length)
+        for i, segment in enumerate(segments):
+            wav = self.synth.synthesize(segment, speed=speed, pitch=pitch, volume=volume)
+            # 同一段文本切分出来的子段之间不额外插入静音
+            self.add_wav(wav, gap_ms=gap_ms if i == 0 else 0)
+        return len(segments)
+
+    def add_wav(self, wav_data: bytes, gap_ms: int = None):
+        """将一段完整的 WAV 数据的 PCM 部分追加到输出文件。"""
+        params, frames = read_wav(wav_data)
+        if self.params is None:
+            self.params = params
+            self._file.write(make_header(params.nchannels, params.sampwidth, params.framerate, 0))
+        elif (params.nchannels, params.sampwidth, params.framerate) != \
+                (self.params.nchannels, self.params.sampwidth, self.params.framerate):
+            raise ValueError("音频格式不一致，无法拼接 (请保证各段使用相同的音色和音程)")
+        elif gap_ms is None or gap_ms:
+            self.add_silence(self.gap_ms if gap_ms is None else gap_ms)
+        self._write(frames)
+        self.segment_count += 1
+
+    def add_silence(self, ms: int):
+        """追加指定时长的静音。必须在写入第一段音频之后调用。"""
+        if self.params is None:
+            raise RuntimeError("尚未写入任何音频，无法确定静音格式")
+        self._write(silence(self.params, ms))
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self.data_size += len(data)
+
+    def close(self):
+        """
+        回填 RIFF 与 data 块的长度字段并关闭文件。
+        :raises ValueError: 没有写入任何音频 (如输入文本为空)，此时删除输出文件，而不是留下 0 字节的 .wav。
+        """
+        if self._file.closed:
+            return
+        if self.params is None:
+            # 没有任何一段音频就无法确定采样格式，写不出有效的 WAV 头
+            self._file.close()
+            os.remove(self._file.name)
+            raise ValueError("没有可拼接的音频，未生成输出文件")
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', 36 + self.data_size))
+        self._file.seek(40)
+        self._file.write(struct.pack('<I', self.data_size))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.close()
+        except ValueError:
+            # 已有异常在传播时不要用 "没有音频" 掩盖它
+            if exc_type is None:
+                raise
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("用法: python assembler.py <输入文本文件> <输出WAV文件>")
+        sys.exit(1)
+
+    converter = ChineseToHiragana()
+    try:
+        with AquesSynthesizer(
+                engine='aq2',
+                voice='aq_yukkuri.phont',
+                dll_base='.\\aqtk2',
+                dic_dir='.\\aq_dic'
+        ) as synth, LongFormAssembler(synth, sys.argv[2], gap_ms=400) as assembler:
+            with open(sys.argv[1], 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        assembler.add_text(converter.convert(line.strip()))
+            print(f"已拼接 {assembler.segment_count} 段音频: {sys.argv[2]}")
+    except Exception as e:
+        print(f"长文本合成失败: {e}")
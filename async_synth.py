@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+from text_to_ja import ChineseToHiragana
+
+
+class _PinnedWorker:
+    """一个 AquesSynthesizer 实例及其专属线程。句柄的创建、使用和释放都只在该线程中进行。"""
+
+    def __init__(self, index: int):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'aques-handle-{index}')
+        self.synth = None
+
+    async def call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+
+class AsyncAquesSynthesizer:
+    """
+    AquesSynthesizer 的 asyncio 版本。
+    内部维护 concurrency 个合成器句柄，每个句柄固定绑定到一个专属线程，
+    因此同一个句柄永远不会被两个线程同时使用。
+    通过 'async with' 语句使用可以确保所有 AqKanji2Koe 句柄被正确释放。
+    """
+
+    def __init__(self, engine: str, voice: str, dll_base: str, dic_dir: str, concurrency: int = 1):
+        """
+        :param engine: 'aq1' 或 'aq2'。
+        :param voice: 对应音色（aq1为子目录名，aq2为phont文件名）。
+        :param dll_base: DLL 基础目录。
+        :param dic_dir: 字典目录。
+        :param concurrency: 并发句柄数，即同时进行的合成任务上限。
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency 必须大于等于 1")
+        self.synth_args = dict(engine=engine, voice=voice, dll_base=dll_base, dic_dir=dic_dir)
+        self.concurrency = concurrency
+        self._workers = []
+        self._idle = None
+
+    async def start(self):
+        """在各自的专属线程中创建全部合成器句柄。"""
+        if self._workers:
+            return
+        self._idle = asyncio.Queue()
+        workers = [_PinnedWorker(i) for i in range(self.concurrency)]
+        results = await asyncio.gather(
+            *(w.call(AquesSynthesizer, **self.synth_args) for w in workers),
+            return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for worker, result in zip(workers, results):
+            if not isinstance(result, BaseException):
+                worker.synth = result
+        self._workers = workers
+        if errors:
+            await self._shutdown()
+            raise errors[0]
+        for worker in workers:
+            self._idle.put_nowait(worker)
+
+    async def synthesize(self, text, speed=100, pitch=100, volume=100) -> bytes:
+        """异步合成一段日文文本，返回 WAV 数据。"""
+        if not self._workers:
+            raise RuntimeError("合成器尚未启动或已关闭")
+        worker = await self._idle.get()
+        try:
+            return await worker.call(worker.synth.synthesize, text, speed=speed, pitch=pitch, volume=volume)
+        finally:
+            # 即使任务被取消，专属线程也会串行执行，所以立即归还句柄是安全的
+            self._idle.put_nowait(worker)
+
+    async def synthesize_iter(self, texts, speed=100, pitch=100, volume=100):
+        """
+        批量合成的异步迭代器。最多同时提交 2 * concurrency 个任务，
+        按输入顺序依次产出 WAV 数据。
+        """
+        window = self.concurrency * 2
+        pending = deque()
+        try:
+            for text in texts:
+                pending.append(asyncio.ensure_future(
+                    self.synthesize(text, speed=speed, pitch=pitch, volume=volume)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aclose(self):
+        """等待进行中的任务结束，然后在各自线程中释放全部句柄。"""
+        if not self._workers:
+            return
+        # 取走所有空闲句柄，确保没有任务仍在使用
+        for _ in range(len(self._workers)):
+            await self._idle.get()
+        await self._shutdown()
+
+    async def _shutdown(self):
+        for worker in self._workers:
+            if worker.synth is not None:
+                await worker.call(worker.synth.close)
+                worker.synth = None
+            worker.executor.shutdown(wait=True)
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    async def demo():
+        converter = ChineseToHiragana()
+        texts = [converter.convert(t) for t in ("你好，世界！", "今日はいい天気ですね。", "异步合成测试")]
+        async with AsyncAquesSynthesizer(
+                engine='aq2',
+                voice='aq_yukkuri.phont',
+                dll_base='.\\aqtk2',
+                dic_dir='.\\aq_dic',
+                concurrency=2
+        ) as synth:
+            idx = 0
+            async for wav in synth.synthesize_iter(texts, speed=100):
+                idx += 1
+                with open(f'async_{idx}.wav', 'wb') as f:
+                    f.write(wav)
+                print(f"已保存: async_{idx}.wav")
+
+    try:
+        asyncio.run(demo())
+    except Exception as e:
+        print(f"异步合成失败: {e}")
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+def cache_key(*parts) -> str:
+    """根据合成参数生成内容寻址的缓存键 (SHA-256 十六进制字符串)。"""
+    payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_version(*paths) -> str:
+    """
+    根据文件内容计算版本指纹，用于在更换 DLL 或音色文件后使旧缓存失效。
+    使用内容而非修改时间，保证共享缓存的多台主机得到相同的指纹。
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class AudioCache:
+    """音频缓存后端的接口。自定义后端 (如 Redis、对象存储) 需实现 get 和 put。"""
+
+    def get(self, key: str):
+        """返回缓存的 WAV 数据，未命中时返回 None。"""
+        raise NotImplementedError
+
+    def put(self, key: str, wav_data: bytes):
+        """写入 WAV 数据。"""
+        raise NotImplementedError
+
+
+class DirectoryAudioStore(AudioCache):
+    """
+    基于目录的内容寻址音频存储，可被多个进程、多台主机通过共享文件系统同时使用。
+    文件按键的前缀分片存放 (ab/cd/abcd....wav)，写入时先写临时文件再原子重命名，
+    读取时一次读取整个文件。总大小超过上限时在后台线程中按最近使用时间 (LRU) 清理。
+    """
+    SUFFIX = '.wav'
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30, low_water: float = 0.9):
+        """
+        :param root: 缓存根目录。
+        :param max_bytes: 缓存总大小上限 (字节)。
+        :param low_water: 清理时删除到 max_bytes * low_water 为止，避免频繁清理。
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+        self._trimming = False
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        # 启动时检查一次已有的缓存大小
+        self._schedule_trim()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key + self.SUFFIX)
+
+    def _touch(self, path: str):
+        try:
+            # 更新修改时间作为 LRU 的最近使用时间 (atime 在很多挂载选项下不可靠)
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (FileNotFoundError, PermissionError):
+            data = b''
+        if not data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(path)
+        return data
+
+    def put(self, key: str, wav_data: bytes):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=self.SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(wav_data)
+            # 原子替换：其他进程要么看到完整的旧文件，要么看到完整的新文件
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._written += len(wav_data)
+            need_trim = self._written > self.max_bytes * (1 - self.low_water)
+        if need_trim:
+            self._schedule_trim()
+
+    def _schedule_trim(self):
+        with self._lock:
+            if self._trimming:
+                return
+            self._trimming = True
+            self._written = 0
+        threading.Thread(target=self._trim_worker, name='audio-cache-trim', daemon=True).start()
+
+    def _trim_worker(self):
+        try:
+            self.trim()
+        except Exception as e:
+            print(f"警告：音频缓存清理失败: {e}")
+        finally:
+            with self._lock:
+                self._trimming = False
+
+    def trim(self) -> int:
+        """若总大小超过上限，按最近使用时间从旧到新删除文件。返回删除的字节数。"""
+        files = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(self.SUFFIX) or name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        target = self.max_bytes * self.low_water
+        removed = 0
+        files.sort()
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except (FileNotFoundError, PermissionError):
+                # 已被其他进程删除，或在 Windows 上仍被映射占用
+                continue
+            total -= size
+            removed += size
+        return removed
+
+    def stats(self) -> dict:
+        return {'root': self.root, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
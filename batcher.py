@@ -0,0 +1,203 @@
+import os
+import sys
+import threading
+import time
+from collections import deque, defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scheduler import _percentiles
+
+
+class _Request:
+    __slots__ = ('voice', 'func', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, voice, func):
+        self.voice = voice
+        self.func = func
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    按音色的自适应微批处理。
+    请求先按音色排队，调度线程在批处理窗口 (几毫秒) 内收集同一音色的请求，然后在该音色的常驻合成器上
+    连续执行整批请求，减少不同音色之间的句柄切换，让 DLL 的字典和音色数据保持在缓存中。
+    批处理器位于准入调度之后，能到达的请求数受准入名额限制：调用方在被接纳后通过 expect(voice)
+    声明即将提交的请求，窗口只等待这些已被接纳但尚未提交的请求，全部到齐后立即开始执行，
+    不会为准入调度不会放行的请求空等。没有通过 expect() 声明的请求不会让窗口等待。
+    窗口和批大小根据观测到的队列深度和请求延迟自动调整：
+    - 延迟超过预算时，窗口减半、批大小减半；
+    - 排队数超过批大小时，批大小加倍以提高吞吐；
+    - 队列中没有可合并的请求时，窗口减半；
+    - 窗口到期时仍有已声明的请求没有到达，窗口逐步放宽；其余情况 (队列深度无法再增长) 保持不变。
+    """
+
+    def __init__(self, pool, workers: int = 4, window_ms: float = 2.0, min_window_ms: float = 0.5,
+                 max_window_ms: float = 20.0, window_step_ms: float = 0.5, max_batch: int = 8,
+                 max_batch_limit: int = 64, latency_budget_ms: float = 200.0, history: int = 1000):
+        """
+        :param pool: EnginePool，批处理期间通过 acquire(voice) 独占该音色的合成器。
+        :param workers: 同时执行的批数 (即同时使用的引擎数)。
+        :param window_ms: 初始批处理窗口 (毫秒)，在 [min_window_ms, max_window_ms] 内自动调整。
+        :param window_step_ms: 窗口每次放宽的步长。
+        :param max_batch: 初始最大批大小，在 [1, max_batch_limit] 内自动调整。
+        :param latency_budget_ms: 单个请求从提交到完成的延迟预算。
+        :param history: 保留的延迟和批大小样本数。
+        """
+        self.pool = pool
+        self.workers = workers
+        self.window_ms = window_ms
+        self.min_window_ms = min_window_ms
+        self.max_window_ms = max_window_ms
+        self.window_step_ms = window_step_ms
+        self.max_batch = max_batch
+        self.max_batch_limit = max_batch_limit
+        self.latency_budget_ms = latency_budget_ms
+        # 按音色排队，OrderedDict 保证同样旧的请求按音色到达顺序被处理
+        self._queues = OrderedDict()
+        self._busy_voices = set()
+        self._expected = defaultdict(int)
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._counters = {'requests': 0, 'batches': 0, 'errors': 0}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='micro-batch')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='micro-batch-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    @contextmanager
+    def expect(self, voice: str):
+        """声明在 with 块内将向该音色提交请求 (通常在准入调度接纳请求后立即调用)。"""
+        with self._cond:
+            self._expected[voice] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._expected[voice] -= 1
+                if not self._expected[voice]:
+                    del self._expected[voice]
+                # 声明的请求可能不再到达 (如文本转换失败)，正在等待的窗口可以提前结束
+                self._cond.notify_all()
+
+    def submit(self, voice: str, func):
+        """
+        提交一个请求并阻塞等待结果。
+        :param func: 函数 synth -> 结果，在该音色的常驻合成器上执行。
+        """
+        request = _Request(voice, func)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("批处理器已关闭")
+            self._queues.setdefault(voice, deque()).append(request)
+            self._pending += 1
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _pick(self):
+        """选择队首请求最早、且当前没有批在执行的音色 (调用方持有锁)。"""
+        best = None
+        for voice, queue in self._queues.items():
+            if voice in self._busy_voices:
+                continue
+            if best is None or queue[0].enqueued < self._queues[best][0].enqueued:
+                best = voice
+        return best
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    voice = self._pick()
+                    if voice is None or len(self._busy_voices) >= self.workers:
+                        self._cond.wait()
+                        continue
+                    queue = self._queues[voice]
+                    # 只会选中没有批在执行的音色，此时已声明的请求要么在队列中，要么还没有提交
+                    incoming = len(queue) < self._expected.get(voice, 0)
+                    remaining = queue[0].enqueued + self.window_ms / 1000 - time.perf_counter()
+                    if len(queue) >= self.max_batch or not incoming or remaining <= 0 or self._closed:
+                        break
+                    self._cond.wait(remaining)
+                depth = len(queue)
+                batch = [queue.popleft() for _ in range(min(depth, self.max_batch))]
+                if not queue:
+                    del self._queues[voice]
+                self._pending -= len(batch)
+                self._busy_voices.add(voice)
+            self._executor.submit(self._run_batch, voice, batch, depth, incoming)
+
+    def _run_batch(self, voice: str, batch: list, depth: int, incoming: bool):
+        try:
+            with self.pool.acquire(voice) as synth:
+                for request in batch:
+                    try:
+                        request.result = request.func(synth)
+                    except Exception as e:
+                        request.error = e
+                    request.done.set()
+        except Exception as e:
+            # 引擎加载失败，整批请求都失败
+            for request in batch:
+                if not request.done.is_set():
+                    request.error = e
+                    request.done.set()
+        finally:
+            now = time.perf_counter()
+            with self._cond:
+                latency = max(now - request.enqueued for request in batch)
+                self._latencies.extend(now - request.enqueued for request in batch)
+                self._batch_sizes.append(len(batch))
+                self._counters['requests'] += len(batch)
+                self._counters['batches'] += 1
+                self._counters['errors'] += sum(request.error is not None for request in batch)
+                self._adapt(depth, latency * 1000, incoming)
+                self._busy_voices.discard(voice)
+                self._cond.notify_all()
+
+    def _adapt(self, depth: int, latency_ms: float, incoming: bool):
+        """
+        根据本批开始时的队列深度和最大延迟调整窗口和批大小 (调用方持有锁)。
+        :param incoming: 本批开始时是否仍有已声明但尚未提交的请求，即更长的窗口能否收集到更多请求。
+        """
+        if latency_ms > self.latency_budget_ms:
+            self.window_ms = max(self.min_window_ms, self.window_ms / 2)
+            self.max_batch = max(1, self.max_batch // 2)
+        elif depth > self.max_batch:
+            self.max_batch = min(self.max_batch_limit, self.max_batch * 2)
+        elif incoming:
+            self.window_ms = min(self.max_window_ms, self.window_ms + self.window_step_ms)
+        elif depth <= 1:
+            self.window_ms = max(self.min_window_ms, self.window_ms / 2)
+
+    def stats(self) -> dict:
+        """返回当前窗口、批大小、计数、平均批大小和请求延迟分位数 (毫秒)。"""
+        with self._cond:
+            sizes = list(self._batch_sizes)
+            return dict(
+                self._counters,
+                window_ms=round(self.window_ms, 2),
+                max_batch=self.max_batch,
+                queued=self._pending,
+                avg_batch=round(sum(sizes) / len(sizes), 2) if sizes else None,
+                latency_ms=_percentiles(sorted(self._latencies)),
+            )
+
+    def close(self):
+        """处理完已提交的请求后停止调度线程。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batcher import MicroBatcher
+
+
+class FakePool:
+    """记录每次 acquire 的音色，合成器就是音色名本身。"""
+
+    def __init__(self, fail=False):
+        self.acquired = []
+        self.fail = fail
+
+    @contextmanager
+    def acquire(self, voice):
+        if self.fail:
+            raise RuntimeError("引擎加载失败")
+        self.acquired.append(voice)
+        yield voice
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+def make(pool, **kwargs):
+    return MicroBatcher(pool, **kwargs)
+
+
+def test_undeclared_request_does_not_wait_for_window(pool):
+    batcher = make(pool, window_ms=500, min_window_ms=500, max_window_ms=500)
+    try:
+        start = time.perf_counter()
+        assert batcher.submit('a', lambda synth: synth + '!') == 'a!'
+        assert time.perf_counter() - start < 0.25
+    finally:
+        batcher.close()
+
+
+def test_declared_requests_are_batched(pool):
+    batcher = make(pool, window_ms=200, min_window_ms=200, max_window_ms=200)
+    results = []
+    # 全部请求先被接纳 (声明)，再陆续提交
+    declared = threading.Barrier(4)
+
+    def request(i):
+        with batcher.expect('a'):
+            declared.wait()
+            time.sleep(0.01 * i)
+            results.append(batcher.submit('a', lambda synth: i))
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    batcher.close()
+    assert sorted(results) == [0, 1, 2, 3]
+    assert pool.acquired == ['a']
+    assert batcher.stats()['avg_batch'] == 4
+
+
+def test_window_ends_when_declared_request_gives_up(pool):
+    batcher = make(pool, window_ms=2000, min_window_ms=2000, max_window_ms=2000)
+    gave_up = threading.Event()
+
+    def abandoned():
+        # 被接纳后在提交前失败 (如文本转换出错)
+        with batcher.expect('a'):
+            time.sleep(0.05)
+        gave_up.set()
+
+    try:
+        with batcher.expect('a'):
+            threading.Thread(target=abandoned).start()
+            time.sleep(0.01)
+            start = time.perf_counter()
+            batcher.submit('a', lambda synth: None)
+            assert time.perf_counter() - start < 1.0
+            assert gave_up.is_set()
+    finally:
+        batcher.close()
+
+
+def test_max_batch_limits_batch_size(pool):
+    # max_batch_limit 固定批大小，否则积压会让批大小自动加倍
+    batcher = make(pool, max_batch=2, max_batch_limit=2, window_ms=50)
+    barrier = threading.Barrier(5)
+    entered = threading.Event()
+
+    def request(i):
+        with batcher.expect('a'):
+            barrier.wait()
+            batcher.submit('a', lambda synth: entered.set())
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    batcher.close()
+    assert entered.is_set()
+    assert batcher.stats()['requests'] == 5
+    assert len(pool.acquired) >= 3
+
+
+def test_errors_are_raised_to_the_submitter(pool):
+    batcher = make(pool)
+    try:
+        with pytest.raises(ZeroDivisionError):
+            batcher.submit('a', lambda synth: 1 / 0)
+        assert batcher.submit('a', lambda synth: 1) == 1
+        assert batcher.stats()['errors'] == 1
+    finally:
+        batcher.close()
+
+
+def test_engine_failure_fails_the_batch():
+    batcher = make(FakePool(fail=True))
+    try:
+        with pytest.raises(RuntimeError, match='引擎加载失败'):
+            batcher.submit('a', lambda synth: 1)
+    finally:
+        batcher.close()
+
+
+def test_closed_batcher_rejects_submit(pool):
+    batcher = make(pool)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit('a', lambda synth: 1)
+
+
+def test_adapt(pool):
+    batcher = make(pool, window_ms=4, min_window_ms=1, max_window_ms=5, window_step_ms=1,
+                   max_batch=4, max_batch_limit=16, latency_budget_ms=100)
+    batcher.close()
+    # 队列深度无法增长时 (没有已声明但未提交的请求) 窗口保持不变
+    batcher._adapt(depth=3, latency_ms=10, incoming=False)
+    assert batcher.window_ms == 4
+    # 窗口到期时仍有请求在路上，放宽窗口，且不超过上限
+    batcher._adapt(depth=3, latency_ms=10, incoming=True)
+    batcher._adapt(depth=3, latency_ms=10, incoming=True)
+    assert batcher.window_ms == 5
+    # 没有可合并的请求时收紧窗口
+    batcher._adapt(depth=1, latency_ms=10, incoming=False)
+    assert batcher.window_ms == 2.5
+    # 积压超过批大小时加倍批大小
+    batcher._adapt(depth=10, latency_ms=10, incoming=False)
+    assert batcher.max_batch == 8
+    # 超过延迟预算时窗口和批大小都减半
+    batcher._adapt(depth=10, latency_ms=500, incoming=True)
+    assert (batcher.window_ms, batcher.max_batch) == (1.25, 4)
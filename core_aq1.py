@@ -62,7 +62,8 @@ class AquesTalkSynthesizer:
         self.aqtk.AquesTalk_FreeWave.restype = None
         self.aqtk.AquesTalk_FreeWave.argtypes = [ctypes.POINTER(ctypes.c_ubyte)]
 
-    def synthesize(self, text: str, speed: int = 100, pitch_factor: float = 1.0, volume: int = 100) -> bytes:
+    def synthesize(self, text: str, speed: int = 100, pitch_factor: float = 1.0, volume: int = 100,
+                   koe: str = None) -> bytes:
         """
         将日文文本合成为 WAV 音频数据，并可调整音程和音量。
 
@@ -70,9 +71,10 @@ class AquesTalkSynthesizer:
         :param speed: 语速 (50-300)。
         :param pitch_factor: 音程系数。1.0为标准音程，大于1.0音程变高，小于1.0音程变低。
         :param volume: 音量百分比 (0-300)。100为标准音量。
+        :param koe: 可选的语音记号列 (Koe)。指定时忽略 text，跳过 AqKanji2Koe 转换。
         :return: WAV 格式的音频数据 (bytes)。
         """
-        koe_string = self._convert_to_koe(text)
+        koe_string = koe if koe is not None else self._convert_to_koe(text)
         wav_data = self._synthesize_from_koe(koe_string, speed)
 
         # --- 音量调整的核心逻辑 (使用 audioop) ---
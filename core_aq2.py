@@ -29,9 +29,9 @@ class AquesTalk2Synthesizer:
         # --- 1. 加载音色文件 (.phont) ---
         try:
             with open(phont_path, "rb") as f:
-                self.phont_data = f.read()
-            # 创建一个 C 兼容的缓冲区，并获取其指针
-            self.phont_buffer = ctypes.create_string_buffer(self.phont_data)
+                phont_data = f.read()
+            # 创建一个 C 兼容的缓冲区，并获取其指针 (只保留这一份拷贝)
+            self.phont_buffer = ctypes.create_string_buffer(phont_data)
             self.p_phont = ctypes.cast(self.phont_buffer, ctypes.c_void_p)
         except FileNotFoundError:
             raise FileNotFoundError(f"音色文件未找到: {phont_path}")
@@ -79,7 +79,8 @@ class AquesTalk2Synthesizer:
         self.aquestalk2_free_wave.argtypes = [ctypes.POINTER(ctypes.c_ubyte)]
         self.aquestalk2_free_wave.restype = None
 
-    def synthesize(self, text: str, speed: int = 100, pitch: int = 100, volume: int = 100) -> bytes:
+    def synthesize(self, text: str, speed: int = 100, pitch: int = 100, volume: int = 100,
+                   koe: str = None) -> bytes:
         """
         将日文文本合成为 WAV 音频数据，并可调整语速、音程和音量。
 
@@ -87,9 +88,10 @@ class AquesTalk2Synthesizer:
         :param speed: 语速 (50-300)。
         :param pitch: 音程百分比 (50-200)。100为标准音程。
         :param volume: 音量百分比 (0-300)。100为标准音量。
+        :param koe: 可选的语音记号列 (Koe)。指定时忽略 text，跳过 AqKanji2Koe 转换。
         :return: WAV 格式的音频数据 (bytes)。
         """
-        koe_string = self._convert_to_koe(text)
+        koe_string = koe if koe is not None else self._convert_to_koe(text)
         wav_data = self._synthesize_from_koe(koe_string, speed)
 
         # 应用音量调节
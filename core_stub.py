@@ -0,0 +1,76 @@
+import audioop
+import math
+import os
+import struct
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from wav_utils import make_header
+
+
+class StubSynthesizer:
+    """
+    不依赖任何 DLL 的桩合成器，接口与 AquesTalk2Synthesizer 相同。
+    每个字符生成一段由字符决定频率的正弦音，标点生成静音，输出确定且与真实引擎格式一致
+    (8kHz, 16-bit, 单声道)，用于在没有 AquesTalk 文件的环境中测试、压测和基准测试。
+    """
+    STANDARD_SAMPLE_RATE = 8000
+    SILENT_CHARS = set(' 　、。，,.！？!?…\n')
+
+    def __init__(self, char_ms: int = 60):
+        """
+        :param char_ms: 语速为 100 时每个字符的时长 (毫秒)。
+        """
+        self.char_ms = char_ms
+        self._tones = {}
+
+    def synthesize(self, text: str, speed: int = 100, pitch: int = 100, volume: int = 100,
+                   koe: str = None) -> bytes:
+        """参数含义与 AquesTalk2Synthesizer.synthesize 相同。"""
+        koe_string = koe if koe is not None else self._convert_to_koe(text)
+        wav_data = self._synthesize_from_koe(koe_string, speed)
+
+        if volume != 100:
+            header, frames = wav_data[:44], wav_data[44:]
+            wav_data = header + audioop.mul(frames, 2, volume / 100.0)
+
+        if pitch != 100:
+            mutable_wav = bytearray(wav_data)
+            new_sample_rate = int(self.STANDARD_SAMPLE_RATE * pitch / 100.0)
+            mutable_wav[24:32] = struct.pack('<II', new_sample_rate, new_sample_rate * 2)
+            wav_data = bytes(mutable_wav)
+
+        return wav_data
+
+    def _convert_to_koe(self, text: str) -> str:
+        return ''.join(text.split())
+
+    def _synthesize_from_koe(self, koe_string: str, speed: int) -> bytes:
+        if not koe_string:
+            raise RuntimeError("StubSynthesizer 合成失败: 输入为空")
+        nframes = max(1, int(self.STANDARD_SAMPLE_RATE * self.char_ms / 1000 * 100 / max(speed, 1)))
+        pcm = b''.join(self._tone(ch, nframes) for ch in koe_string)
+        return make_header(1, 2, self.STANDARD_SAMPLE_RATE, len(pcm)) + pcm
+
+    def _tone(self, ch: str, nframes: int) -> bytes:
+        key = (ch, nframes)
+        tone = self._tones.get(key)
+        if tone is None:
+            if ch in self.SILENT_CHARS:
+                tone = b'\x00\x00' * nframes
+            else:
+                freq = 200 + ord(ch) % 400
+                step = 2 * math.pi * freq / self.STANDARD_SAMPLE_RATE
+                tone = struct.pack(f'<{nframes}h', *(int(6000 * math.sin(i * step)) for i in range(nframes)))
+            if len(self._tones) >= 4096:
+                self._tones.clear()
+            self._tones[key] = tone
+        return tone
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,62 @@
+import time
+
+
+class DeadlineExceeded(RuntimeError):
+    """请求已超过截止时间或已被取消，剩余的工作被放弃。"""
+
+    def __init__(self, stage: str = None, cancelled: bool = False):
+        self.stage = stage
+        self.cancelled = cancelled
+        reason = "请求已取消" if cancelled else "已超过截止时间"
+        super().__init__(f"{reason} (阶段: {stage})" if stage else reason)
+
+
+class Deadline:
+    """
+    单个请求的截止时间，沿文本转换、Koe 转换和逐段合成传递，在各阶段之间调用 check() 检查。
+    可选的 probe 函数返回 True 表示请求已被取消 (例如客户端已断开)，为控制开销最多每 probe_interval 秒调用一次。
+    """
+
+    def __init__(self, timeout: float = None, probe=None, probe_interval: float = 0.05):
+        """
+        :param timeout: 从现在起的剩余时间 (秒)，None 表示没有时间限制。
+        :param probe: 可选的取消检测函数。
+        :param probe_interval: 两次调用 probe 的最小间隔 (秒)。
+        """
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.cancelled = False
+        self._next_probe = 0.0
+
+    @property
+    def limited(self) -> bool:
+        """有时间限制或取消检测函数时为 True；否则 check() 只在显式调用 cancel() 后才会失败。"""
+        return self.expires is not None or self.probe is not None
+
+    def remaining(self):
+        """剩余时间 (秒)，没有时间限制时返回 None。"""
+        return None if self.expires is None else self.expires - time.monotonic()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def expired(self) -> bool:
+        if self.cancelled:
+            return True
+        now = time.monotonic()
+        if self.expires is not None and now >= self.expires:
+            return True
+        if self.probe is not None and now >= self._next_probe:
+            self._next_probe = now + self.probe_interval
+            if self.probe():
+                self.cancelled = True
+        return self.cancelled
+
+    def check(self, stage: str = None):
+        """
+        :param stage: 当前所处的阶段，写入异常中用于统计。
+        :raises DeadlineExceeded: 已超过截止时间或已被取消。
+        """
+        if self.expired():
+            raise DeadlineExceeded(stage, self.cancelled)
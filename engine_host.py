@@ -0,0 +1,234 @@
+"""
+进程外引擎宿主。
+
+AquesTalk 的 DLL 是 32 位的，只能在 32 位 Python 中加载。本模块让 64 位的应用进程通过
+子进程调用一个 32 位 Python 运行的宿主进程，由宿主持有 core_aq1 / core_aq2 的 ctypes 封装：
+
+* 控制通道：宿主的 stdin / stdout，使用紧凑的二进制帧 (1 字节操作码 + 4 字节长度 + 负载)；
+* 数据通道：由应用进程创建的共享内存环形缓冲区，宿主把 WAV 数据直接写入其中，
+  应答中只返回偏移和长度，避免音频数据经过管道和序列化。
+
+宿主进程的启动方式: python engine_host.py (通常由 RemoteAquesSynthesizer 自动启动)。
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+from multiprocessing import shared_memory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+
+HOST_SCRIPT = os.path.abspath(__file__)
+# 运行宿主的 (32 位) Python 解释器，默认与当前进程相同
+HOST_PYTHON = os.environ.get('AQ_HOST_PYTHON', sys.executable)
+RING_SIZE = 4 * 1024 * 1024
+
+# 帧头: 操作码/状态 (uint8) + 负载长度 (uint32)
+FRAME_HEADER = struct.Struct('<BI')
+# 合成请求: speed, pitch, volume (uint16) + 输入类型 (uint8, 0 为文本, 1 为 Koe)，后接 UTF-8 字符串
+SYNTH_HEADER = struct.Struct('<HHHB')
+# 共享内存中的数据位置: 偏移, 长度 (uint32)
+SHM_SLICE = struct.Struct('<II')
+
+OP_OPEN = 1
+OP_SYNTH = 2
+OP_KOE = 3
+OP_CLOSE = 4
+OP_KOE_INPUT = 5  # 与 OP_KOE 相同，但转换失败视为输入错误
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_SHM = 2  # 数据在共享内存中
+STATUS_INLINE = 3  # 数据超出环形缓冲区，直接放在负载中
+STATUS_INVALID = 4  # 输入错误 (ValueError)，调用方应作为客户端错误处理
+
+INPUT_TEXT = 0
+INPUT_KOE = 1
+INPUT_CLIENT_KOE = 2  # 调用方直接提供的 Koe，引擎拒绝时视为输入错误
+
+
+def _read_exact(stream, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("引擎宿主通道已关闭")
+        data += chunk
+    return bytes(data)
+
+
+def _send(stream, code: int, payload: bytes = b''):
+    stream.write(FRAME_HEADER.pack(code, len(payload)) + payload)
+    stream.flush()
+
+
+def _recv(stream):
+    code, length = FRAME_HEADER.unpack(_read_exact(stream, FRAME_HEADER.size))
+    return code, _read_exact(stream, length)
+
+
+def _attach_shm(name: str):
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name != 'nt':
+        # POSIX 下附加方也会被 resource_tracker 记录并在退出时删除共享内存，由创建方负责释放
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+def serve(stdin, stdout):
+    """宿主主循环：逐条处理请求，直到收到 OP_CLOSE 或通道关闭。"""
+    synth = None
+    shm = None
+    ring_pos = 0
+    try:
+        while True:
+            try:
+                op, payload = _recv(stdin)
+            except EOFError:
+                break
+            try:
+                if op == OP_OPEN:
+                    config = json.loads(payload.decode('utf-8'))
+                    shm = _attach_shm(config['shm_name'])
+                    synth = AquesSynthesizer(
+                        engine=config['engine'],
+                        voice=config['voice'],
+                        dll_base=config['dll_base'],
+                        dic_dir=config['dic_dir']
+                    )
+                    _send(stdout, STATUS_OK, json.dumps({'voice_version': synth.voice_version}).encode('utf-8'))
+                elif op == OP_SYNTH:
+                    speed, pitch, volume, kind = SYNTH_HEADER.unpack_from(payload)
+                    value = payload[SYNTH_HEADER.size:].decode('utf-8')
+                    if kind in (INPUT_KOE, INPUT_CLIENT_KOE):
+                        wav = synth._synthesize(None, speed, pitch, volume, koe=value,
+                                                client_koe=kind == INPUT_CLIENT_KOE)
+                    else:
+                        wav = synth._synthesize(value, speed, pitch, volume)
+                    if len(wav) > shm.size:
+                        _send(stdout, STATUS_INLINE, wav)
+                        continue
+                    if ring_pos + len(wav) > shm.size:
+                        ring_pos = 0
+                    shm.buf[ring_pos:ring_pos + len(wav)] = wav
+                    _send(stdout, STATUS_SHM, SHM_SLICE.pack(ring_pos, len(wav)))
+                    ring_pos += len(wav)
+                elif op in (OP_KOE, OP_KOE_INPUT):
+                    koe = synth._convert_to_koe(payload.decode('utf-8'), client_input=op == OP_KOE_INPUT)
+                    _send(stdout, STATUS_OK, koe.encode('utf-8'))
+                elif op == OP_CLOSE:
+                    _send(stdout, STATUS_OK)
+                    break
+                else:
+                    raise ValueError(f"未知的操作码: {op}")
+            except ValueError as e:
+                _send(stdout, STATUS_INVALID, str(e).encode('utf-8'))
+            except Exception as e:
+                _send(stdout, STATUS_ERROR, str(e).encode('utf-8'))
+    finally:
+        if synth is not None:
+            synth.close()
+        if shm is not None:
+            shm.close()
+
+
+class RemoteAquesSynthesizer(AquesSynthesizer):
+    """
+    在独立宿主进程中运行引擎的 AquesSynthesizer，接口与 AquesSynthesizer 相同。
+    缓存和静音压缩等后处理在本进程中完成，宿主进程只负责发音转换和波形合成。
+    可以安全地被多个线程共享 (请求会被串行化)。
+    """
+
+    def __init__(self, engine: str, voice: str, dll_base: str, dic_dir: str, cache=None,
+                 trim_silence: bool = False, max_pause_ms: int = 300,
+                 python: str = None, ring_size: int = RING_SIZE):
+        """
+        :param python: 运行宿主的 Python 解释器路径，默认为环境变量 AQ_HOST_PYTHON 或当前解释器。
+        :param ring_size: 共享内存环形缓冲区的大小 (字节)。
+        其余参数与 AquesSynthesizer 相同。
+        """
+        self.engine = engine.lower()
+        self.voice = voice
+        self.synth = None
+        self._init_options(cache, trim_silence, max_pause_ms)
+        self._lock = threading.Lock()
+        self.proc = None
+        self.shm = shared_memory.SharedMemory(create=True, size=ring_size)
+        try:
+            self.proc = subprocess.Popen(
+                [python or HOST_PYTHON, HOST_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            config = {
+                'engine': engine, 'voice': voice, 'dll_base': dll_base, 'dic_dir': dic_dir,
+                'shm_name': self.shm.name,
+            }
+            _, payload = self._call(OP_OPEN, json.dumps(config).encode('utf-8'))
+            self._voice_version = json.loads(payload.decode('utf-8'))['voice_version']
+        except Exception:
+            self.close()
+            raise
+
+    def _call(self, op: int, payload: bytes = b''):
+        with self._lock:
+            if self.proc is None or self.proc.poll() is not None:
+                raise RuntimeError("引擎宿主进程已退出")
+            try:
+                _send(self.proc.stdin, op, payload)
+                code, result = _recv(self.proc.stdout)
+            except (EOFError, OSError) as e:
+                raise RuntimeError(f"与引擎宿主通信失败: {e}")
+            if code == STATUS_ERROR:
+                raise RuntimeError(result.decode('utf-8'))
+            if code == STATUS_INVALID:
+                raise ValueError(result.decode('utf-8'))
+            if code == STATUS_SHM:
+                offset, length = SHM_SLICE.unpack(result)
+                # 在持有锁时复制出来，之后宿主可以覆盖环形缓冲区的这一部分
+                result = bytes(self.shm.buf[offset:offset + length])
+            return code, result
+
+    def _synthesize(self, text, speed, pitch, volume, koe=None, client_koe=False):
+        if koe is not None:
+            kind, value = (INPUT_CLIENT_KOE if client_koe else INPUT_KOE), koe
+        else:
+            kind, value = INPUT_TEXT, text
+        payload = SYNTH_HEADER.pack(speed, pitch, volume, kind) + value.encode('utf-8')
+        return self._call(OP_SYNTH, payload)[1]
+
+    def _convert_to_koe(self, text, client_input=False):
+        return self._call(OP_KOE_INPUT if client_input else OP_KOE, text.encode('utf-8'))[1].decode('utf-8')
+
+    def close(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                try:
+                    self._call(OP_CLOSE)
+                except RuntimeError:
+                    pass
+                try:
+                    self.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+                    self.proc.wait()
+            self.proc.stdin.close()
+            self.proc.stdout.close()
+            self.proc = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+if __name__ == '__main__':
+    # 协议使用 stdout，底层库的 print 输出重定向到 stderr，避免破坏数据帧
+    protocol_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    serve(sys.stdin.buffer, protocol_out)
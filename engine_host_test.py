@@ -0,0 +1,68 @@
+import os
+import sys
+from multiprocessing import shared_memory
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+from engine_host import RemoteAquesSynthesizer
+
+TEXT = 'こんにちは、きょうはいいてんきですね。'
+
+
+@pytest.fixture
+def local():
+    synth = AquesSynthesizer('stub', 'stub', '.', '.')
+    yield synth
+    synth.close()
+
+
+@pytest.fixture
+def remote():
+    synth = RemoteAquesSynthesizer('stub', 'stub', '.', '.')
+    yield synth
+    synth.close()
+
+
+def test_output_matches_local_engine(local, remote):
+    assert remote.voice_version == local.voice_version
+    assert remote.convert_to_koe(TEXT) == local.convert_to_koe(TEXT)
+    for speed, pitch, volume in [(100, 100, 100), (150, 80, 50), (60, 200, 300)]:
+        assert remote.synthesize(TEXT, speed, pitch, volume) == local.synthesize(TEXT, speed, pitch, volume)
+        koe = local.convert_to_koe(TEXT)
+        assert remote.synthesize(koe=koe, speed=speed) == local.synthesize(koe=koe, speed=speed)
+
+
+def test_ring_buffer_wraps_and_large_output_is_inline(local):
+    # 每段约 1KB，环形缓冲区只能放下几段，超过缓冲区大小的结果直接放在负载中返回
+    remote = RemoteAquesSynthesizer('stub', 'stub', '.', '.', ring_size=4096)
+    try:
+        for text in ['あ', 'あいう', 'あいうえお', 'あ' * 200, 'かきくけこ', 'あ' * 200, 'さ']:
+            wav = remote.synthesize(text)
+            assert wav == local.synthesize(text)
+        assert len(local.synthesize('あ' * 200)) > 4096
+    finally:
+        remote.close()
+
+
+def test_errors_cross_the_process_boundary(remote):
+    # 调用方提供的 Koe 被引擎拒绝是输入错误，由文本转换得到的输入出错是引擎错误
+    with pytest.raises(ValueError, match='无效的语音记号列'):
+        remote.synthesize(koe='')
+    with pytest.raises(RuntimeError):
+        remote.synthesize(' ')
+    # 出错后宿主进程仍可继续使用
+    assert remote.synthesize('あ')
+
+
+def test_close_stops_host_and_unlinks_shared_memory():
+    remote = RemoteAquesSynthesizer('stub', 'stub', '.', '.')
+    proc, shm_name = remote.proc, remote.shm.name
+    remote.synthesize('あ')
+    remote.close()
+    assert proc.poll() is not None
+    assert remote.proc is None and remote.shm is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shm_name)
+    with pytest.raises(RuntimeError):
+        remote.synthesize('あ')
+    remote.close()  # 重复关闭没有副作用
@@ -0,0 +1,174 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+
+# 预热合成使用的文本，用于提前触发 DLL、字典和音色数据的页面加载
+WARMUP_TEXT = 'こんにちは'
+
+
+class EngineEntry:
+    """一个音色对应的常驻合成器及其状态。"""
+    STATE_IDLE = 'idle'
+    STATE_LOADING = 'loading'
+    STATE_READY = 'ready'
+    STATE_FAILED = 'failed'
+
+    def __init__(self, voice: str, engine: str, dll_base: str):
+        self.voice = voice
+        self.engine = engine
+        self.dll_base = dll_base
+        self.synth = None
+        self.state = self.STATE_IDLE
+        self.error = None
+        self.load_ms = None
+        self.warmup_ms = None
+        self.requests = 0
+        # 同一个句柄同一时间只能被一个线程使用
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        return {
+            'engine': self.engine,
+            'state': self.state,
+            'error': self.error,
+            'load_ms': self.load_ms,
+            'warmup_ms': self.warmup_ms,
+            'requests': self.requests,
+            'trimmed_bytes': self.synth.trimmed_bytes if self.synth is not None else 0,
+        }
+
+
+class EnginePool:
+    """
+    按音色缓存常驻的 AquesSynthesizer 实例，避免每个请求重复加载 DLL、初始化字典和读取音色文件。
+    支持启动时预加载并预热一组音色，并提供就绪状态和各音色引擎状态的查询。
+    """
+
+    def __init__(self, resolver, dic_dir: str, warmup_text: str = WARMUP_TEXT,
+                 factory=AquesSynthesizer, **synth_options):
+        """
+        :param resolver: 函数 voice -> (engine, dll_base)，用于确定音色对应的引擎和 DLL 目录。
+        :param dic_dir: 字典目录。
+        :param warmup_text: 预热合成使用的文本。
+        :param factory: 合成器类，默认为 AquesSynthesizer，也可以是 engine_host.RemoteAquesSynthesizer。
+        :param synth_options: 传给每个合成器的其他参数 (如 cache、trim_silence)。
+        """
+        self.resolver = resolver
+        self.dic_dir = dic_dir
+        self.factory = factory
+        self.synth_options = synth_options
+        self.warmup_text = warmup_text
+        self.entries = {}
+        self.preload_voices = []
+        self.preload_done = False
+        self._lock = threading.Lock()
+
+    def _get_entry(self, voice: str) -> EngineEntry:
+        with self._lock:
+            entry = self.entries.get(voice)
+            if entry is None:
+                engine, dll_base = self.resolver(voice)
+                entry = EngineEntry(voice, engine, dll_base)
+                self.entries[voice] = entry
+            return entry
+
+    def _load(self, entry: EngineEntry, warmup: bool = False):
+        """加载引擎 (调用方必须持有 entry.lock)。失败的引擎会在下次使用时重试。"""
+        if entry.synth is not None:
+            return
+        entry.state = EngineEntry.STATE_LOADING
+        entry.error = None
+        try:
+            start = time.perf_counter()
+            entry.synth = self.factory(
+                engine=entry.engine,
+                voice=entry.voice,
+                dll_base=entry.dll_base,
+                dic_dir=self.dic_dir,
+                **self.synth_options
+            )
+            entry.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            if warmup:
+                start = time.perf_counter()
+                # 预热直接调用底层合成，不经过缓存
+                entry.synth._synthesize(self.warmup_text, 100, 100, 100)
+                entry.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+            entry.state = EngineEntry.STATE_READY
+        except Exception as e:
+            if entry.synth is not None:
+                entry.synth.close()
+                entry.synth = None
+            entry.state = EngineEntry.STATE_FAILED
+            entry.error = str(e)
+            raise
+
+    @contextmanager
+    def acquire(self, voice: str):
+        """独占地获取某个音色的合成器，必要时先加载。"""
+        entry = self._get_entry(voice)
+        with entry.lock:
+            self._load(entry)
+            entry.requests += 1
+            yield entry.synth
+
+    def voice_version(self, voice: str) -> str:
+        """音色的内容指纹 (见 AquesSynthesizer.voice_version)，引擎尚未加载时先加载。"""
+        synth = self._get_entry(voice).synth
+        if synth is None:
+            with self.acquire(voice) as synth:
+                return synth.voice_version
+        return synth.voice_version
+
+    def preload(self, voices):
+        """依次加载并预热指定的音色，全部完成后标记为就绪。单个音色失败不会中断其余音色。"""
+        self.preload_voices = list(voices)
+        for voice in self.preload_voices:
+            entry = self._get_entry(voice)
+            with entry.lock:
+                try:
+                    self._load(entry, warmup=True)
+                except Exception as e:
+                    print(f"音色 {voice} 预加载失败: {e}")
+        self.preload_done = True
+
+    def start_preload(self, voices) -> threading.Thread:
+        """在后台线程中执行 preload，服务可以在预热期间启动并对就绪探针返回未就绪。"""
+        thread = threading.Thread(target=self.preload, args=(voices,), name='engine-preload', daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self) -> bool:
+        """预加载已完成且所有预加载音色均可用时返回 True。"""
+        if not self.preload_done:
+            return False
+        with self._lock:
+            entries = [self.entries.get(v) for v in self.preload_voices]
+        # close() 之后条目已被清空，视为未就绪
+        return all(entry is not None and entry.state == EngineEntry.STATE_READY for entry in entries)
+
+    def health(self) -> dict:
+        with self._lock:
+            entries = list(self.entries.values())
+        voices = {entry.voice: entry.to_dict() for entry in entries}
+        failed = any(entry.state == EngineEntry.STATE_FAILED for entry in entries)
+        return {
+            'status': 'degraded' if failed else 'ok',
+            'ready': self.is_ready(),
+            'voices': voices,
+        }
+
+    def close(self):
+        """释放所有常驻的合成器。"""
+        with self._lock:
+            entries = list(self.entries.values())
+            self.entries = {}
+        for entry in entries:
+            with entry.lock:
+                if entry.synth is not None:
+                    entry.synth.close()
+                    entry.synth = None
+                entry.state = EngineEntry.STATE_IDLE
@@ -4,7 +4,11 @@ import platform
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from core_aq1 import AquesTalkSynthesizer
 from core_aq2 import AquesTalk2Synthesizer
+from core_stub import StubSynthesizer
 from text_to_ja import ChineseToHiragana
+from audio_cache import cache_key, file_version
+from wav_utils import compact_silence
+from deadline import Deadline
 import re
 
 
@@ -17,14 +21,20 @@ class AquesSynthesizer:
     """
     整合 AquesTalk1 和 AquesTalk2 的统一语音合成器。
     参数:
-        engine: 'aq1' 或 'aq2'
+        engine: 'aq1'、'aq2' 或 'stub' (不需要 DLL 的桩引擎，用于测试)
         voice:  对应音色（aq1为子目录名，aq2为phont文件名）
         dll_base: DLL 基础目录
         dic_dir: 字典目录
+        cache:  可选的持久化缓存后端 (audio_cache.AudioCache)
+        trim_silence: 是否去除首尾静音并压缩过长的停顿
+        max_pause_ms: 开启 trim_silence 时中间停顿保留的最大时长 (毫秒)
     """
-    def __init__(self, engine: str, voice: str, dll_base: str, dic_dir: str):
+    def __init__(self, engine: str, voice: str, dll_base: str, dic_dir: str, cache=None,
+                 trim_silence: bool = False, max_pause_ms: int = 300):
         self.engine = engine.lower()
+        self.voice = voice
         self.synth = None
+        self._init_options(cache, trim_silence, max_pause_ms)
 
         if self.engine == 'aq1':
             aqtk_path = os.path.join(dll_base, voice, 'AquesTalk.dll')
@@ -34,6 +44,7 @@ class AquesSynthesizer:
                 aqk2k_path=aqk2k_path,
                 dic_path=dic_dir
             )
+            self.version_paths = [aqtk_path] + self._kanji2koe_paths(aqk2k_path, dic_dir)
         elif self.engine == 'aq2':
             aqtk2_path = os.path.join(dll_base, 'AquesTalk2.dll')
             aqk2k_path = os.path.join(dll_base, '..', 'AqKanji2Koe.dll')
@@ -44,17 +55,118 @@ class AquesSynthesizer:
                 dic_path=dic_dir,
                 phont_path=phont_path
             )
+            self.version_paths = [aqtk2_path, phont_path] + self._kanji2koe_paths(aqk2k_path, dic_dir)
+        elif self.engine == 'stub':
+            self.synth = StubSynthesizer()
+            self.version_paths = []
         else:
-            raise ValueError("engine 只能为 'aq1' 或 'aq2'")
+            raise ValueError("engine 只能为 'aq1'、'aq2' 或 'stub'")
 
-    def synthesize(self, text, speed=100, pitch=100, volume=100):
-        if self.engine == 'aq1':
-            # aq1: pitch_factor为float，100为标准
-            pitch_factor = pitch / 100.0
-            return self.synth.synthesize(text, speed=speed, pitch_factor=pitch_factor, volume=volume)
-        else:
-            # aq2: pitch为百分比
-            return self.synth.synthesize(text, speed=speed, pitch=pitch, volume=volume)
+    @staticmethod
+    def _kanji2koe_paths(aqk2k_path, dic_dir):
+        """AqKanji2Koe 的 DLL 和字典目录下的全部文件，它们决定了文本到 Koe 的转换结果。"""
+        paths = [aqk2k_path]
+        if os.path.isdir(dic_dir):
+            paths += sorted(os.path.join(dic_dir, name) for name in os.listdir(dic_dir)
+                            if os.path.isfile(os.path.join(dic_dir, name)))
+        return paths
+
+    def _init_options(self, cache, trim_silence, max_pause_ms):
+        self.cache = cache
+        self.trim_silence = trim_silence
+        self.max_pause_ms = max_pause_ms
+        # 静音压缩节省的字节数：最近一次合成 / 累计
+        self.last_trimmed_bytes = 0
+        self.trimmed_bytes = 0
+        self._voice_version = None
+
+    @property
+    def voice_version(self):
+        """引擎 DLL 与音色文件的内容指纹，写入缓存键中，更换音色后旧缓存自动失效。"""
+        if self._voice_version is None:
+            self._voice_version = file_version(*self.version_paths)
+        return self._voice_version
+
+    def convert_to_koe(self, text):
+        """
+        将日文文本转换为语音记号列 (Koe)，不进行合成。
+        :raises ValueError: AqKanji2Koe 无法转换该文本。
+        """
+        return self._convert_to_koe(text, client_input=True)
+
+    def _convert_to_koe(self, text, client_input=False):
+        """
+        :param client_input: 文本由调用方直接提供时为 True，此时 AqKanji2Koe 的失败视为输入错误 (ValueError)，
+                             否则保留为引擎错误 (RuntimeError)。
+        """
+        try:
+            return self.synth._convert_to_koe(text)
+        except RuntimeError as e:
+            if not client_input:
+                raise
+            raise ValueError(f"无法转换的文本: {e}") from e
+
+    def synthesize(self, text=None, speed=100, pitch=100, volume=100, koe=None, deadline: Deadline = None):
+        """
+        合成 WAV 音频。text 与 koe 二选一：
+        传入 koe (语音记号列) 时直接合成，跳过 AqKanji2Koe 转换。
+        指定 deadline 时，在 Koe 转换和波形合成之前分别检查，超时则抛出 DeadlineExceeded。
+        :raises ValueError: 传入的 koe 格式错误，引擎拒绝合成。
+        """
+        if (text is None) == (koe is None):
+            raise ValueError("text 和 koe 必须且只能指定一个")
+        self.last_trimmed_bytes = 0
+        if self.cache is None:
+            return self._render(text, speed, pitch, volume, koe, deadline)
+
+        trim = self.max_pause_ms if self.trim_silence else None
+        key = cache_key(self.engine, self.voice, self.voice_version, text, koe, speed, pitch, volume, trim)
+        wav = self.cache.get(key)
+        if wav is not None:
+            return wav
+        wav = self._render(text, speed, pitch, volume, koe, deadline)
+        try:
+            self.cache.put(key, wav)
+        except OSError as e:
+            print(f"警告：写入音频缓存失败: {e}")
+        return wav
+
+    def _render(self, text, speed, pitch, volume, koe, deadline):
+        # 只有调用方直接传入的 koe 被引擎拒绝时才算输入错误，由文本转换得到的 koe 出错属于引擎错误
+        client_koe = koe is not None
+        if deadline is not None and deadline.limited:
+            deadline.check('koe' if koe is None else 'wave')
+            if koe is None:
+                # 分两步执行，以便在 Koe 转换和波形合成之间检查截止时间
+                koe, text = self._convert_to_koe(text), None
+                deadline.check('wave')
+        return self._postprocess(self._synthesize(text, speed, pitch, volume, koe, client_koe=client_koe))
+
+    def _postprocess(self, wav):
+        if not self.trim_silence:
+            return wav
+        wav, saved = compact_silence(wav, max_pause_ms=self.max_pause_ms)
+        self.last_trimmed_bytes = saved
+        self.trimmed_bytes += saved
+        return wav
+
+    def _synthesize(self, text, speed, pitch, volume, koe=None, client_koe=False):
+        """
+        :param client_koe: koe 由调用方直接提供时为 True，此时引擎拒绝合成视为输入错误 (ValueError)。
+        """
+        try:
+            if self.engine == 'aq1':
+                # aq1: pitch_factor为float，100为标准
+                pitch_factor = pitch / 100.0
+                return self.synth.synthesize(text, speed=speed, pitch_factor=pitch_factor, volume=volume, koe=koe)
+            else:
+                # aq2: pitch为百分比
+                return self.synth.synthesize(text, speed=speed, pitch=pitch, volume=volume, koe=koe)
+        except RuntimeError as e:
+            if not client_koe:
+                raise
+            # 调用方直接提供的 Koe 有误 (如未定义的记号)，属于输入错误
+            raise ValueError(f"无效的语音记号列: {e}") from e
 
     def close(self):
         if self.synth:
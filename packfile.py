@@ -0,0 +1,290 @@
+"""
+带索引的打包输出格式，用于超大批量合成。
+
+逐句输出独立的 .wav 文件在数十万条规模下会产生大量 inode 和小文件写入。打包格式把音频顺序追加到
+少量大数据文件中，另用定长记录的索引文件记录每条音频的位置和参数：
+
+    output.pack/
+        index       文件头 (魔数、版本、JSON 元数据) + 定长索引记录
+        00000.dat   依次追加的完整 WAV 数据，超过 max_pack_bytes 后切换到下一个数据文件
+        00001.dat
+
+读取时通过 mmap 随机访问，可按序号或文本查找，并按需导出单个 WAV 文件。
+
+    python packfile.py info output.pack
+    python packfile.py list output.pack
+    python packfile.py extract output.pack out_dir [-n 序号 ...]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections import namedtuple
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MAGIC = b'AQPK'
+FORMAT_VERSION = 1
+INDEX_NAME = 'index'
+MAX_PACK_BYTES = 1 << 30
+# 文件头: 魔数 + 版本 (uint16) + 元数据长度 (uint32)，后接 UTF-8 JSON 元数据
+HEADER = struct.Struct('<4sHI')
+# 索引记录: 输入序号 (uint32), 数据文件编号 (uint16), 偏移 (uint64), 长度 (uint32),
+# 文本哈希 (16 字节), speed, pitch, volume (uint16)
+RECORD = struct.Struct('<IHQI16sHHH')
+
+PackEntry = namedtuple('PackEntry', 'index pack offset length text_hash speed pitch volume')
+
+
+def text_hash(text: str) -> bytes:
+    """索引中保存的文本指纹 (SHA-256 的前 16 字节)。"""
+    return hashlib.sha256(text.encode('utf-8')).digest()[:16]
+
+
+def _data_path(path: str, pack: int) -> str:
+    return os.path.join(path, f'{pack:05d}.dat')
+
+
+def _read_index(path: str):
+    """读取索引文件，返回 (元数据, 记录列表, 有效数据的结束位置)。末尾不完整的记录会被忽略。"""
+    with open(os.path.join(path, INDEX_NAME), 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"打包文件索引不完整: {path}")
+    magic, version, meta_len = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"不是打包文件: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"不支持的打包文件版本: {version}")
+    start = HEADER.size + meta_len
+    meta = json.loads(data[HEADER.size:start].decode('utf-8'))
+    end = start + (len(data) - start) // RECORD.size * RECORD.size
+    entries = [PackEntry(*fields) for fields in RECORD.iter_unpack(data[start:end])]
+    return meta, entries, end
+
+
+class PackWriter:
+    """
+    打包文件的写入器。可以被多个线程共享 (写入会被串行化)。
+    每条音频先写入数据文件并刷新，再追加索引记录并刷新，因此进程崩溃时已返回的记录都不会丢失；
+    重新打开时会丢弃索引中不完整的记录和数据文件末尾没有索引的部分，然后继续追加。
+    刷新只是把数据交给操作系统，切换数据文件和 close() 时才调用 fsync，
+    断电时最近一个数据文件中的记录可能丢失，需要更强的保证时可调用 sync()。
+    """
+
+    def __init__(self, path: str, max_pack_bytes: int = MAX_PACK_BYTES, meta: dict = None):
+        """
+        :param path: 打包目录，不存在时创建，已存在时继续追加。
+        :param max_pack_bytes: 单个数据文件的大小上限。
+        :param meta: 新建时写入索引头的元数据 (如音色、引擎)，继续追加时忽略。
+        """
+        self.path = path
+        self.max_pack_bytes = max_pack_bytes
+        self._lock = threading.Lock()
+        index_path = os.path.join(path, INDEX_NAME)
+        if os.path.isfile(index_path):
+            self.meta, entries, index_end = _read_index(path)
+            self.count = len(entries)
+            self.pack = max((e.pack for e in entries), default=0)
+            self.pack_size = max((e.offset + e.length for e in entries if e.pack == self.pack), default=0)
+            with open(index_path, 'r+b') as f:
+                f.truncate(index_end)
+            if os.path.isfile(_data_path(path, self.pack)):
+                with open(_data_path(path, self.pack), 'r+b') as f:
+                    f.truncate(self.pack_size)
+            self._index = open(index_path, 'ab')
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.meta = dict(meta or {})
+            payload = json.dumps(self.meta, ensure_ascii=False).encode('utf-8')
+            self._index = open(index_path, 'wb')
+            self._index.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(payload)) + payload)
+            self.count = 0
+            self.pack = 0
+            self.pack_size = 0
+        self._data = open(_data_path(path, self.pack), 'ab')
+
+    def add(self, wav_data: bytes, text: str, index: int = None,
+            speed: int = 100, pitch: int = 100, volume: int = 100) -> int:
+        """
+        追加一条音频，返回其在打包文件中的记录序号。
+        :param index: 输入序号 (例如批量任务中的句子序号)，默认为记录序号。
+        """
+        with self._lock:
+            if self._data is None:
+                raise ValueError("打包文件已关闭")
+            if self.pack_size and self.pack_size + len(wav_data) > self.max_pack_bytes:
+                # 写满的数据文件不会再改动，落盘后再切换
+                self._sync()
+                self._data.close()
+                self.pack += 1
+                self.pack_size = 0
+                # 'wb' 丢弃上次中断时可能残留的、没有索引的数据文件
+                self._data = open(_data_path(self.path, self.pack), 'wb')
+            offset = self.pack_size
+            self._data.write(wav_data)
+            self._data.flush()
+            self.pack_size += len(wav_data)
+            record_no = self.count
+            self._index.write(RECORD.pack(
+                record_no if index is None else index, self.pack, offset, len(wav_data),
+                text_hash(text), speed, pitch, volume
+            ))
+            self._index.flush()
+            self.count += 1
+            return record_no
+
+    def _sync(self):
+        """将数据文件和索引写入磁盘 (调用方持有锁)。先同步数据，保证索引不会指向未落盘的数据。"""
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        self._index.flush()
+        os.fsync(self._index.fileno())
+
+    def sync(self):
+        """将已添加的全部记录写入磁盘。"""
+        with self._lock:
+            if self._data is not None:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._data is not None:
+                self._sync()
+                self._data.close()
+                self._index.close()
+                self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PackReader:
+    """打包文件的只读访问，数据文件通过 mmap 映射，按需读取单条音频。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta, self.entries, _ = _read_index(path)
+        self._maps = {}
+        self._files = {}
+        self._by_hash = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def _map(self, pack: int) -> mmap.mmap:
+        with self._lock:
+            m = self._maps.get(pack)
+            if m is None:
+                f = open(_data_path(self.path, pack), 'rb')
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._files[pack] = f
+                self._maps[pack] = m
+            return m
+
+    def view(self, record_no: int) -> memoryview:
+        """返回第 record_no 条音频的零拷贝视图 (在 close() 之前有效)。"""
+        e = self.entries[record_no]
+        return memoryview(self._map(e.pack))[e.offset:e.offset + e.length]
+
+    def read(self, record_no: int) -> bytes:
+        """返回第 record_no 条音频的 WAV 数据。"""
+        e = self.entries[record_no]
+        return self._map(e.pack)[e.offset:e.offset + e.length]
+
+    def find(self, text: str, speed: int = None, pitch: int = None, volume: int = None) -> list:
+        """按文本 (及可选的参数) 查找，返回匹配的记录序号列表。"""
+        if self._by_hash is None:
+            by_hash = {}
+            for record_no, e in enumerate(self.entries):
+                by_hash.setdefault(e.text_hash, []).append(record_no)
+            self._by_hash = by_hash
+        result = []
+        for record_no in self._by_hash.get(text_hash(text), []):
+            e = self.entries[record_no]
+            if (speed is None or e.speed == speed) and (pitch is None or e.pitch == pitch) \
+                    and (volume is None or e.volume == volume):
+                result.append(record_no)
+        return result
+
+    def extract(self, record_no: int, file_path: str):
+        """将第 record_no 条音频导出为独立的 WAV 文件。"""
+        with open(file_path, 'wb') as f:
+            f.write(self.view(record_no))
+
+    def close(self):
+        with self._lock:
+            for m in self._maps.values():
+                m.close()
+            for f in self._files.values():
+                f.close()
+            self._maps.clear()
+            self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def pack_sink(writer: PackWriter, speed: int = 100, pitch: int = 100, volume: int = 100):
+    """
+    返回一个供 pipeline.build_synthesis_pipeline 使用的输出函数，将每段音频追加到打包文件中。
+    speed / pitch / volume 只作为参数记录写入索引，应与流水线的合成参数一致。
+    """
+
+    def sink(job):
+        writer.add(job['wav'], job['text'], job['index'], speed, pitch, volume)
+        del job['wav']  # 写入后释放音频数据
+
+    return sink
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AquesTalkPy 打包文件工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_info = sub.add_parser('info', help='显示元数据和统计信息')
+    p_info.add_argument('pack')
+    p_list = sub.add_parser('list', help='列出全部记录')
+    p_list.add_argument('pack')
+    p_extract = sub.add_parser('extract', help='导出为独立的 WAV 文件')
+    p_extract.add_argument('pack')
+    p_extract.add_argument('output_dir')
+    p_extract.add_argument('-n', '--index', type=int, nargs='*', help='只导出这些输入序号，默认全部导出')
+    args = parser.parse_args(argv)
+
+    with PackReader(args.pack) as reader:
+        if args.command == 'info':
+            packs = {e.pack for e in reader}
+            total = sum(e.length for e in reader)
+            print(json.dumps(reader.meta, ensure_ascii=False))
+            print(f"记录数: {len(reader)}  数据文件: {len(packs)}  音频总大小: {total / 1048576:.1f}MB")
+        elif args.command == 'list':
+            for record_no, e in enumerate(reader):
+                print(f"{record_no}\t{e.index}\t{e.pack:05d}.dat+{e.offset}\t{e.length}\t"
+                      f"{e.text_hash.hex()}\t{e.speed}/{e.pitch}/{e.volume}")
+        else:
+            os.makedirs(args.output_dir, exist_ok=True)
+            wanted = set(args.index) if args.index else None
+            extracted = 0
+            for record_no, e in enumerate(reader):
+                if wanted is None or e.index in wanted:
+                    reader.extract(record_no, os.path.join(args.output_dir, f'{e.index + 1}.wav'))
+                    extracted += 1
+            print(f"已导出 {extracted} 个文件到 {args.output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import sys
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from packfile import PackWriter, PackReader, pack_sink, main, INDEX_NAME, RECORD
+
+
+def wav(n: int, size: int = 100) -> bytes:
+    return b'RIFF' + bytes([n % 256]) * size
+
+
+def test_round_trip_and_lookup(tmp_path):
+    path = str(tmp_path / 'out.pack')
+    with PackWriter(path, meta={'voice': 'f1'}) as writer:
+        for i in range(5):
+            assert writer.add(wav(i), f'text{i}', index=i * 10, speed=100 + i) == i
+    with PackReader(path) as reader:
+        assert reader.meta == {'voice': 'f1'}
+        assert len(reader) == 5
+        assert [e.index for e in reader] == [0, 10, 20, 30, 40]
+        assert reader.read(3) == wav(3)
+        assert bytes(reader.view(4)) == wav(4)
+        assert reader.find('text2') == [2]
+        assert reader.find('text2', speed=102) == [2]
+        assert reader.find('text2', speed=100) == []
+        assert reader.find('missing') == []
+        reader.extract(1, str(tmp_path / 'one.wav'))
+    assert (tmp_path / 'one.wav').read_bytes() == wav(1)
+
+
+def test_rollover_to_new_data_file(tmp_path):
+    path = str(tmp_path / 'out.pack')
+    with PackWriter(path, max_pack_bytes=250) as writer:
+        for i in range(5):
+            writer.add(wav(i), f'text{i}')
+    with PackReader(path) as reader:
+        assert [e.pack for e in reader] == [0, 0, 1, 1, 2]
+        assert [reader.read(i) for i in range(5)] == [wav(i) for i in range(5)]
+    assert sorted(os.listdir(path)) == ['00000.dat', '00001.dat', '00002.dat', INDEX_NAME]
+
+
+def test_index_is_readable_before_close(tmp_path):
+    path = str(tmp_path / 'out.pack')
+    writer = PackWriter(path)
+    writer.add(wav(1), 'a')
+    writer.add(wav(2), 'b')
+    with PackReader(path) as reader:
+        assert len(reader) == 2 and reader.read(1) == wav(2)
+    writer.close()
+
+
+def test_reopen_appends(tmp_path):
+    path = str(tmp_path / 'out.pack')
+    with PackWriter(path, max_pack_bytes=250, meta={'run': 1}) as writer:
+        for i in range(3):
+            writer.add(wav(i), f'text{i}')
+    with PackWriter(path, max_pack_bytes=250, meta={'run': 2}) as writer:
+        assert writer.count == 3
+        for i in range(3, 6):
+            assert writer.add(wav(i), f'text{i}') == i
+    with PackReader(path) as reader:
+        assert reader.meta == {'run': 1}
+        assert [reader.read(i) for i in range(6)] == [wav(i) for i in range(6)]
+
+
+def test_recovers_from_torn_index_and_orphan_data(tmp_path):
+    path = str(tmp_path / 'out.pack')
+    with PackWriter(path) as writer:
+        for i in range(3):
+            writer.add(wav(i), f'text{i}')
+    # 模拟中断：最后一条记录只写了一半，数据文件末尾还有没有索引的数据
+    index_path = os.path.join(path, INDEX_NAME)
+    size = os.path.getsize(index_path)
+    with open(index_path, 'r+b') as f:
+        f.truncate(size - RECORD.size // 2)
+    with open(os.path.join(path, '00000.dat'), 'ab') as f:
+        f.write(b'orphan data')
+    with PackReader(path) as reader:
+        assert len(reader) == 2
+    with PackWriter(path) as writer:
+        assert writer.count == 2
+        writer.add(wav(9), 'text9')
+    with PackReader(path) as reader:
+        assert [reader.read(i) for i in range(3)] == [wav(0), wav(1), wav(9)]
+    assert os.path.getsize(os.path.join(path, '00000.dat')) == 3 * len(wav(0))
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'out.pack'
+    path.mkdir()
+    (path / INDEX_NAME).write_bytes(b'NOPE' + b'\0' * 16)
+    with pytest.raises(ValueError):
+        PackReader(str(path))
+
+
+def test_closed_writer_rejects_add(tmp_path):
+    writer = PackWriter(str(tmp_path / 'out.pack'))
+    writer.close()
+    with pytest.raises(ValueError):
+        writer.add(wav(0), 'a')
+    writer.close()
+
+
+def test_pack_sink_and_cli(tmp_path, capsys):
+    path = str(tmp_path / 'out.pack')
+    with PackWriter(path) as writer:
+        sink = pack_sink(writer, speed=120)
+        for i in range(3):
+            job = {'index': i, 'text': f'text{i}', 'wav': wav(i)}
+            sink(job)
+            assert 'wav' not in job
+    with PackReader(path) as reader:
+        assert [e.speed for e in reader] == [120] * 3
+    assert main(['info', path]) == 0
+    assert '记录数: 3' in capsys.readouterr().out
+    out_dir = str(tmp_path / 'wavs')
+    assert main(['extract', path, out_dir, '-n', '1']) == 0
+    assert os.listdir(out_dir) == ['2.wav']
+    assert (tmp_path / 'wavs' / '2.wav').read_bytes() == wav(1)
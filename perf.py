@@ -0,0 +1,271 @@
+"""
+性能回归测试工具。
+
+    python perf.py run -o baseline.json          # 运行全部基准测试并保存结果
+    python perf.py run -o current.json -k text   # 只运行名称包含 text 的基准测试
+    python perf.py compare baseline.json current.json
+
+compare 对每个基准测试的耗时样本做 Mann-Whitney U 检验，只有在统计显著 (p < alpha)
+且中位数或 p90 的变化超过阈值时才判定为回归；单次调用的内存分配峰值超过阈值也判定为回归。
+存在回归时退出码为 1，便于在 CI 中使用。
+合成相关的基准测试使用桩引擎 (engine='stub')，不需要 AquesTalk 的 DLL。
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AQ_STUB_ENGINE', '1')
+os.environ.setdefault('AQ_PRELOAD_VOICES', '')
+
+SAMPLE_TEXT = "我想用这个生成Yukkuri语音，今天的天气真好。Hello world! これはテストです。"
+KOE_TEXT = "こんにちわ'/きょ'うわ/いい'/テンキデ_ス."
+TRACKED_PACKAGES = ('pykakasi', 'pypinyin', 'regex', 'Flask', 'Werkzeug')
+
+
+def _bench_text_convert():
+    from text_to_ja import ChineseToHiragana
+    converter = ChineseToHiragana()
+    return lambda: converter.convert(SAMPLE_TEXT)
+
+
+def _bench_text_convert_user_dict():
+    from text_to_ja import ChineseToHiragana
+    from user_dict import UserDictionary
+    user_dict = UserDictionary({f'词条{i}': 'テスト' for i in range(1000)})
+    user_dict.update({'天气': 'テンチー', 'Yukkuri': 'ユックリ'})
+    converter = ChineseToHiragana(user_dict=user_dict)
+    return lambda: converter.convert(SAMPLE_TEXT)
+
+
+def _bench_synth_text():
+    from main import AquesSynthesizer
+    synth = AquesSynthesizer('stub', 'stub', '.', '.')
+    return lambda: synth.synthesize("こんにちは、きょうはいいてんきですね。", speed=110, pitch=120, volume=130)
+
+
+def _bench_synth_koe():
+    from main import AquesSynthesizer
+    synth = AquesSynthesizer('stub', 'stub', '.', '.')
+    return lambda: synth.synthesize(koe=KOE_TEXT)
+
+
+def _bench_synth_trim():
+    from main import AquesSynthesizer
+    synth = AquesSynthesizer('stub', 'stub', '.', '.', trim_silence=True)
+    return lambda: synth.synthesize("。。。こんにちは。。。。。。。。きょうは。。。")
+
+
+def _bench_http_synthesize():
+    import api
+    client = api.app.test_client()
+    body = {'text': SAMPLE_TEXT, 'voice': 'stub.phont'}
+
+    def run():
+        response = client.post('/synthesize', json=body)
+        assert response.status_code == 200, response.data
+    return run
+
+
+def _bench_http_tts_not_modified():
+    import api
+    client = api.app.test_client()
+    url = '/tts?voice=stub.phont&text=' + SAMPLE_TEXT
+    etag = client.get(url).headers['ETag']
+
+    def run():
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+    return run
+
+
+BENCHMARKS = {
+    'text_convert': _bench_text_convert,
+    'text_convert_user_dict': _bench_text_convert_user_dict,
+    'synth_stub_text': _bench_synth_text,
+    'synth_stub_koe': _bench_synth_koe,
+    'synth_stub_trim': _bench_synth_trim,
+    'http_synthesize': _bench_http_synthesize,
+    'http_tts_304': _bench_http_tts_not_modified,
+}
+
+
+def percentile(sorted_values, q):
+    """线性插值的分位数。"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def measure(func, samples: int, warmup: int, alloc_runs: int) -> dict:
+    """对 func 计时 samples 次，并在 tracemalloc 下额外运行 alloc_runs 次统计内存分配。"""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+
+    # 内存统计单独进行，避免 tracemalloc 的开销影响计时
+    tracemalloc.start()
+    peaks = []
+    try:
+        for _ in range(alloc_runs):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    ordered = sorted(times)
+    return {
+        'samples_ms': [round(t, 4) for t in times],
+        'mean_ms': round(sum(times) / len(times), 4),
+        'p50_ms': round(percentile(ordered, 0.50), 4),
+        'p90_ms': round(percentile(ordered, 0.90), 4),
+        'p99_ms': round(percentile(ordered, 0.99), 4),
+        'alloc_peak_kb': round(sorted(peaks)[len(peaks) // 2] / 1024, 2) if peaks else None,
+    }
+
+
+def environment() -> dict:
+    from importlib import metadata
+    packages = {}
+    for name in TRACKED_PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        'python': platform.python_version(),
+        'architecture': platform.architecture()[0],
+        'platform': platform.platform(),
+        'packages': packages,
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def run_benchmarks(names, samples: int, warmup: int, alloc_runs: int) -> dict:
+    results = {}
+    for name in names:
+        func = BENCHMARKS[name]()
+        results[name] = measure(func, samples, warmup, alloc_runs)
+        r = results[name]
+        print(f"{name:<26} p50={r['p50_ms']:.3f}ms  p90={r['p90_ms']:.3f}ms  "
+              f"p99={r['p99_ms']:.3f}ms  alloc={r['alloc_peak_kb']}KB")
+    return {'environment': environment(), 'benchmarks': results}
+
+
+def mann_whitney_p(baseline, current) -> float:
+    """
+    单侧 Mann-Whitney U 检验 (正态近似，含并列秩修正)：
+    返回 "current 的耗时整体大于 baseline" 这一假设下的 p 值。
+    """
+    n1, n2 = len(current), len(baseline)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(v, 0) for v in current] + [(v, 1) for v in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+    r1 = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare(baseline: dict, current: dict, threshold: float, alpha: float, alloc_threshold: float) -> list:
+    """返回 (名称, 是否回归, 说明) 列表。"""
+    rows = []
+    for name, cur in current['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            rows.append((name, False, '基线中不存在，跳过'))
+            continue
+        p = mann_whitney_p(base['samples_ms'], cur['samples_ms'])
+        changes = {key: cur[key] / base[key] - 1 for key in ('p50_ms', 'p90_ms', 'p99_ms') if base[key]}
+        slower = p < alpha and (changes.get('p50_ms', 0) > threshold or changes.get('p90_ms', 0) > threshold)
+        alloc_change = None
+        if base.get('alloc_peak_kb') and cur.get('alloc_peak_kb') is not None:
+            alloc_change = cur['alloc_peak_kb'] / base['alloc_peak_kb'] - 1
+        more_alloc = alloc_change is not None and alloc_change > alloc_threshold
+        detail = '  '.join(f"{key[:-3]} {change:+.1%}" for key, change in changes.items())
+        detail += f"  p={p:.4f}"
+        if alloc_change is not None:
+            detail += f"  alloc {alloc_change:+.1%}"
+        rows.append((name, slower or more_alloc, detail))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AquesTalkPy 性能回归测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='运行基准测试并保存结果')
+    p_run.add_argument('-o', '--output', required=True, help='结果 JSON 文件')
+    p_run.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的基准测试')
+    p_run.add_argument('-n', '--samples', type=int, default=200, help='每个基准测试的计时样本数')
+    p_run.add_argument('--warmup', type=int, default=20)
+    p_run.add_argument('--alloc-runs', type=int, default=20)
+
+    p_cmp = sub.add_parser('compare', help='将结果与基线比较')
+    p_cmp.add_argument('baseline')
+    p_cmp.add_argument('current')
+    p_cmp.add_argument('--threshold', type=float, default=0.10, help='耗时回归阈值 (默认 10%%)')
+    p_cmp.add_argument('--alpha', type=float, default=0.01, help='显著性水平 (默认 0.01)')
+    p_cmp.add_argument('--alloc-threshold', type=float, default=0.20, help='内存分配回归阈值 (默认 20%%)')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        names = [name for name in BENCHMARKS if args.filter in name]
+        if not names:
+            parser.error(f"没有匹配 {args.filter!r} 的基准测试")
+        result = run_benchmarks(names, args.samples, args.warmup, args.alloc_runs)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"结果已保存: {args.output}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    for key in TRACKED_PACKAGES:
+        old = baseline['environment']['packages'].get(key)
+        new = current['environment']['packages'].get(key)
+        if old != new:
+            print(f"依赖版本变化: {key} {old} -> {new}")
+    regressions = 0
+    for name, regressed, detail in compare(baseline, current, args.threshold, args.alpha, args.alloc_threshold):
+        regressions += regressed
+        print(f"{'回归' if regressed else '正常'}  {name:<26} {detail}")
+    print(f"共 {regressions} 项回归")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import os
+import sys
+import queue
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from main import AquesSynthesizer
+from text_to_ja import ChineseToHiragana
+from deadline import Deadline
+
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+    func(value, ctx) 处理一个数据项并返回新的值；ctx 为每个工作线程通过 setup() 创建的私有状态
+    (例如合成器句柄)，线程结束时调用 teardown(ctx) 释放。
+    """
+
+    def __init__(self, name: str, func, workers: int = 1, setup=None, teardown=None):
+        if workers < 1:
+            raise ValueError("workers 必须大于等于 1")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.setup = setup
+        self.teardown = teardown
+
+
+class PipelineItem:
+    """在阶段之间流转的数据项。某个阶段出错后，error 被设置，后续阶段直接跳过该项。"""
+    __slots__ = ('index', 'value', 'error', 'stage')
+
+    def __init__(self, index: int, value):
+        self.index = index
+        self.value = value
+        self.error = None
+        self.stage = None
+
+
+class Pipeline:
+    """
+    多阶段生产者/消费者流水线。相邻阶段之间使用有界队列连接，每个阶段可配置并行的工作线程数，
+    各阶段同时运行，总吞吐量取决于最慢的阶段而不是所有阶段耗时之和。
+    ctypes 调用 DLL 和文件写入期间会释放 GIL，因此可以与纯 Python 的文本转换重叠执行。
+    """
+
+    def __init__(self, stages, queue_size: int = 16):
+        """
+        :param stages: Stage 列表，按执行顺序排列。
+        :param queue_size: 每个阶段输入队列的容量，用于限制内存占用并形成背压。
+        """
+        if not stages:
+            raise ValueError("至少需要一个阶段")
+        self.stages = list(stages)
+        self.queue_size = queue_size
+
+    def run(self, values, ordered: bool = False, deadline: Deadline = None):
+        """
+        处理 values 中的全部数据，以生成器的形式产出 PipelineItem。
+
+        :param ordered: 为 True 时按输入顺序产出，否则按完成顺序产出。
+        :param deadline: 可选的截止时间，超时或取消后尚未处理的阶段被跳过，
+                         数据项的 error 为 DeadlineExceeded，stage 为被放弃的阶段。
+        :raises Exception: 迭代 values 时抛出的异常，在此前读取的数据项全部产出后重新抛出。
+        """
+        queues = [queue.Queue(self.queue_size) for _ in self.stages] + [queue.Queue(self.queue_size)]
+        stop = threading.Event()
+        remaining = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+        threads = []
+        feed_error = []
+
+        def put(q, item):
+            # 带超时的 put，使消费方提前退出时工作线程不会永久阻塞
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def feed():
+            try:
+                for index, value in enumerate(values):
+                    if stop.is_set():
+                        break
+                    put(queues[0], PipelineItem(index, value))
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                # 无论输入是否出错都要发送结束标记，否则各阶段和消费方会一直等待
+                for _ in range(self.stages[0].workers):
+                    put(queues[0], _DONE)
+
+        def work(i, stage):
+            ctx = None
+            try:
+                if stage.setup is not None:
+                    ctx = stage.setup()
+                while True:
+                    item = get(queues[i])
+                    if item is _DONE:
+                        break
+                    if item.error is None and not stop.is_set():
+                        try:
+                            if deadline is not None:
+                                deadline.check(stage.name)
+                            item.value = stage.func(item.value, ctx)
+                        except Exception as e:
+                            item.error = e
+                            item.stage = stage.name
+                    put(queues[i + 1], item)
+            except Exception as e:
+                # setup 失败：该线程无法工作，后续收到的数据项全部标记为失败
+                while True:
+                    item = get(queues[i])
+                    if item is _DONE:
+                        break
+                    item.error = item.error or e
+                    item.stage = item.stage or stage.name
+                    put(queues[i + 1], item)
+            finally:
+                try:
+                    if ctx is not None and stage.teardown is not None:
+                        stage.teardown(ctx)
+                except Exception:
+                    pass  # 释放失败不能阻止结束标记的传递
+                with lock:
+                    remaining[i] -= 1
+                    last = remaining[i] == 0
+                if last:
+                    # 本阶段全部线程结束后，向下一阶段的每个线程发送结束标记
+                    next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+                    for _ in range(next_workers):
+                        put(queues[i + 1], _DONE)
+
+        threads.append(threading.Thread(target=feed, name='pipeline-feed', daemon=True))
+        for i, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=work, args=(i, stage),
+                                                name=f'pipeline-{stage.name}-{n}', daemon=True))
+        for t in threads:
+            t.start()
+
+        pending = {}
+        next_index = 0
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                if not ordered:
+                    yield item
+                    continue
+                pending[item.index] = item
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+            if feed_error:
+                raise feed_error[0]
+        finally:
+            stop.set()
+            for t in threads:
+                t.join(timeout=1)
+
+
+class SynthesisPipeline(Pipeline):
+    """由 build_synthesis_pipeline 构建的合成流水线，输入为文本，每个数据项附带输入序号。"""
+
+    def run(self, texts, ordered: bool = False, deadline: Deadline = None):
+        return super().run(enumerate(texts), ordered=ordered, deadline=deadline)
+
+
+def build_synthesis_pipeline(engine: str, voice: str, dll_base: str, dic_dir: str, sink,
+                             speed: int = 100, pitch: int = 100, volume: int = 100,
+                             converter: ChineseToHiragana = None, postprocess=None,
+                             text_workers: int = 1, koe_workers: int = 1, wave_workers: int = 1,
+                             post_workers: int = 1, sink_workers: int = 1, queue_size: int = 16,
+                             **synth_options) -> SynthesisPipeline:
+    """
+    构建标准的合成流水线: 文本前端 -> Koe 转换 -> 波形合成 -> 后处理 -> 输出。
+    每个 Koe / 波形阶段的工作线程各自持有一个 AquesSynthesizer 句柄。
+    流水线的输入为原始文本，每个数据项的值是一个字典，依次填入 'ja'、'koe'、'wav' 字段。
+
+    :param sink: 输出函数 sink(job)，job 为包含 'index'、'text'、'wav' 等字段的字典。
+    :param postprocess: 可选的后处理函数 wav -> wav，例如静音压缩。
+    :param synth_options: 传给 AquesSynthesizer 的其他参数。
+    """
+    converter = converter or ChineseToHiragana()
+
+    def open_synth():
+        return AquesSynthesizer(engine=engine, voice=voice, dll_base=dll_base, dic_dir=dic_dir, **synth_options)
+
+    def text_front(value, _):
+        index, text = value
+        return {'index': index, 'text': text, 'ja': converter.convert(text)}
+
+    def to_koe(job, synth):
+        job['koe'] = synth.convert_to_koe(job['ja'])
+        return job
+
+    def to_wave(job, synth):
+        job['wav'] = synth.synthesize(koe=job['koe'], speed=speed, pitch=pitch, volume=volume)
+        return job
+
+    def post(job, _):
+        job['wav'] = postprocess(job['wav'])
+        return job
+
+    def output(job, _):
+        sink(job)
+        return job
+
+    stages = [
+        Stage('text', text_front, text_workers),
+        Stage('koe', to_koe, koe_workers, setup=open_synth, teardown=lambda s: s.close()),
+        Stage('wave', to_wave, wave_workers, setup=open_synth, teardown=lambda s: s.close()),
+    ]
+    if postprocess is not None:
+        stages.append(Stage('post', post, post_workers))
+    stages.append(Stage('sink', output, sink_workers))
+    return SynthesisPipeline(stages, queue_size=queue_size)
+
+
+def file_sink(dir_path: str):
+    """返回一个输出函数，将每段音频保存为 dir_path 下的 {前缀}_{序号}.wav 文件。"""
+    os.makedirs(dir_path, exist_ok=True)
+
+    def sink(job):
+        prefix = AquesSynthesizer.get_prefix(job['text'])
+        with open(os.path.join(dir_path, f"{prefix}_{job['index'] + 1}.wav"), 'wb') as f:
+            f.write(job['wav'])
+        del job['wav']  # 写入后释放音频数据
+
+    return sink
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("用法: python pipeline.py <输入文本文件 (每行一句)> <输出目录> [--pack]")
+        print("      指定 --pack 时输出为带索引的打包文件 (见 packfile.py)，而不是逐句的 WAV 文件")
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    writer = None
+    if '--pack' in sys.argv[3:]:
+        from packfile import PackWriter, pack_sink
+        writer = PackWriter(sys.argv[2], meta={'engine': 'aq2', 'voice': 'aq_yukkuri.phont'})
+        sink = pack_sink(writer)
+    else:
+        sink = file_sink(sys.argv[2])
+
+    pipeline = build_synthesis_pipeline(
+        engine='aq2',
+        voice='aq_yukkuri.phont',
+        dll_base='.\\aqtk2',
+        dic_dir='.\\aq_dic',
+        sink=sink,
+        text_workers=2,
+        wave_workers=2
+    )
+    failed = 0
+    for item in pipeline.run(lines):
+        if item.error is not None:
+            failed += 1
+            print(f"第 {item.index + 1} 句在 {item.stage} 阶段失败: {item.error}")
+    if writer is not None:
+        writer.close()
+    print(f"完成: 成功 {len(lines) - failed} 句，失败 {failed} 句")
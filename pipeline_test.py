@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pipeline import Pipeline, Stage
+
+
+def pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('pipeline-') and t.is_alive()]
+
+
+def double(value, _):
+    return value * 2
+
+
+def test_results_in_order():
+    pipeline = Pipeline([Stage('double', double, workers=3), Stage('inc', lambda v, _: v + 1)])
+    items = list(pipeline.run(range(50), ordered=True))
+    assert [item.value for item in items] == [i * 2 + 1 for i in range(50)]
+    assert all(item.error is None for item in items)
+
+
+def test_stage_error_marks_item():
+    def fail_odd(value, _):
+        if value % 2:
+            raise ValueError(value)
+        return value
+
+    items = list(Pipeline([Stage('check', fail_odd), Stage('double', double)]).run(range(4), ordered=True))
+    assert [item.value for item in items if item.error is None] == [0, 4]
+    assert [item.stage for item in items if item.error is not None] == ['check', 'check']
+
+
+def test_raising_input_is_reraised():
+    def values():
+        yield 1
+        yield 2
+        raise RuntimeError("输入读取失败")
+
+    pipeline = Pipeline([Stage('double', double, workers=2), Stage('double2', double)])
+    result = []
+    done = threading.Event()
+
+    def consume():
+        with pytest.raises(RuntimeError, match="输入读取失败"):
+            for item in pipeline.run(values(), ordered=True):
+                result.append(item.value)
+        done.set()
+
+    # 在单独的线程中消费，出错时测试失败而不是永久挂起
+    threading.Thread(target=consume, daemon=True).start()
+    assert done.wait(5), "流水线在输入出错后没有结束"
+    assert result == [4, 8]
+
+
+def test_early_consumer_exit_stops_workers():
+    pipeline = Pipeline([Stage('double', double, workers=2), Stage('double2', double)], queue_size=2)
+    for item in pipeline.run(iter(range(10000))):
+        break
+    assert item.error is None
+    assert not pipeline_threads()
+
+
+def test_teardown_error_does_not_hang():
+    def teardown(_):
+        raise RuntimeError("teardown")
+
+    pipeline = Pipeline([Stage('double', double, workers=2, setup=object, teardown=teardown)])
+    done = threading.Event()
+    result = []
+
+    def consume():
+        result.extend(item.value for item in pipeline.run(range(5)))
+        done.set()
+
+    threading.Thread(target=consume, daemon=True).start()
+    assert done.wait(5), "teardown 出错后流水线没有结束"
+    assert sorted(result) == [0, 2, 4, 6, 8]
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+
+
+class AdmissionRejected(RuntimeError):
+    """队列已满或等待超时，请求未被接纳。"""
+
+
+class _Ticket:
+    __slots__ = ('client', 'voice', 'priority', 'enqueued', 'admitted')
+
+    def __init__(self, client, voice, priority):
+        self.client = client
+        self.voice = voice
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.admitted = False
+
+
+class AdmissionScheduler:
+    """
+    引擎池前的准入调度器。
+    - 优先级：按 priorities 的顺序严格优先，交互式请求总是先于批量请求被接纳；
+    - 配额：每个客户端同时进行的合成数不超过 client_quota；
+    - 公平性：同一优先级内按音色进行加权公平排队 (WFQ)，避免某个音色的大批量任务独占引擎。
+    每个优先级的排队等待时间会被记录，可通过 stats() 查看。
+    """
+
+    def __init__(self, capacity: int = 4, client_quota: int = 2, max_queue: int = 256,
+                 priorities=(PRIORITY_INTERACTIVE, PRIORITY_BULK), voice_weights: dict = None,
+                 history: int = 1000):
+        """
+        :param capacity: 全局同时进行的合成数上限。
+        :param client_quota: 单个客户端同时进行的合成数上限。
+        :param max_queue: 每个优先级允许排队的最大请求数，超过时直接拒绝。
+        :param priorities: 优先级名称，按从高到低排列。
+        :param voice_weights: 各音色的权重，默认均为 1。权重越大，分到的引擎时间越多。
+        :param history: 每个优先级保留的等待时间样本数。
+        """
+        self.capacity = capacity
+        self.client_quota = client_quota
+        self.max_queue = max_queue
+        self.priorities = list(priorities)
+        self.voice_weights = voice_weights or {}
+        self._cond = threading.Condition()
+        self._queues = {p: defaultdict(deque) for p in self.priorities}
+        self._virtual_time = {p: 0.0 for p in self.priorities}
+        self._voice_tags = {p: {} for p in self.priorities}
+        self._running = 0
+        self._client_running = defaultdict(int)
+        self._waits = {p: deque(maxlen=history) for p in self.priorities}
+        self._counters = {p: {'admitted': 0, 'rejected': 0} for p in self.priorities}
+
+    @contextmanager
+    def admit(self, client: str, voice: str, priority: str = PRIORITY_INTERACTIVE, timeout: float = None):
+        """
+        阻塞直到请求被接纳，在 with 块结束时释放名额。
+
+        :raises AdmissionRejected: 队列已满或在 timeout 秒内未被接纳。
+        """
+        ticket = self._enqueue(client, voice, priority)
+        self._wait(ticket, timeout)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def _enqueue(self, client, voice, priority) -> _Ticket:
+        if priority not in self._queues:
+            raise ValueError(f"未知的优先级: {priority}")
+        with self._cond:
+            queues = self._queues[priority]
+            if sum(len(q) for q in queues.values()) >= self.max_queue:
+                self._counters[priority]['rejected'] += 1
+                raise AdmissionRejected(f"{priority} 队列已满")
+            ticket = _Ticket(client, voice, priority)
+            if not queues[voice]:
+                # 音色从空闲变为有积压时，虚拟时间追上当前进度，不能补用空闲期间的份额
+                tags = self._voice_tags[priority]
+                tags[voice] = max(tags.get(voice, 0.0), self._virtual_time[priority])
+            queues[voice].append(ticket)
+            self._dispatch()
+            return ticket
+
+    def _wait(self, ticket: _Ticket, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not ticket.admitted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    queue = self._queues[ticket.priority][ticket.voice]
+                    queue.remove(ticket)
+                    self._counters[ticket.priority]['rejected'] += 1
+                    raise AdmissionRejected(f"排队超时 ({timeout} 秒)")
+                self._cond.wait(remaining)
+
+    def _release(self, ticket: _Ticket):
+        with self._cond:
+            self._running -= 1
+            self._client_running[ticket.client] -= 1
+            if not self._client_running[ticket.client]:
+                del self._client_running[ticket.client]
+            self._dispatch()
+
+    def _pick(self):
+        """按优先级和音色的虚拟完成时间挑选下一个可接纳的请求 (调用方持有锁)。"""
+        for priority in self.priorities:
+            queues = self._queues[priority]
+            tags = self._voice_tags[priority]
+            best = None
+            for voice, queue in queues.items():
+                if not queue or (best is not None and tags[voice] >= tags[best[0]]):
+                    continue
+                for ticket in queue:
+                    if self._client_running[ticket.client] < self.client_quota:
+                        best = (voice, ticket)
+                        break
+            if best is not None:
+                voice, ticket = best
+                queues[voice].remove(ticket)
+                self._virtual_time[priority] = tags[voice]
+                tags[voice] += 1.0 / self.voice_weights.get(voice, 1.0)
+                if not queues[voice]:
+                    del queues[voice]
+                return ticket
+        return None
+
+    def _dispatch(self):
+        admitted = False
+        while self._running < self.capacity:
+            ticket = self._pick()
+            if ticket is None:
+                break
+            ticket.admitted = True
+            self._running += 1
+            self._client_running[ticket.client] += 1
+            self._waits[ticket.priority].append(time.perf_counter() - ticket.enqueued)
+            self._counters[ticket.priority]['admitted'] += 1
+            admitted = True
+        if admitted:
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """返回各优先级的排队长度、接纳/拒绝计数和等待时间分位数 (毫秒)。"""
+        with self._cond:
+            classes = {}
+            for priority in self.priorities:
+                waits = sorted(self._waits[priority])
+                classes[priority] = dict(
+                    self._counters[priority],
+                    queued=sum(len(q) for q in self._queues[priority].values()),
+                    wait_ms=_percentiles(waits),
+                )
+            return {'capacity': self.capacity, 'running': self._running, 'classes': classes}
+
+
+def _percentiles(sorted_values) -> dict:
+    if not sorted_values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    def pick(q):
+        return round(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000, 2)
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(sorted_values[-1] * 1000, 2)}
@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+import time
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scheduler import AdmissionScheduler, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BULK
+
+
+def queued(scheduler) -> int:
+    return sum(c['queued'] for c in scheduler.stats()['classes'].values())
+
+
+def wait_until(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "等待超时"
+        time.sleep(0.001)
+
+
+def admission_order(scheduler, requests, holder=('holder', 'holder')):
+    """
+    先占满名额，再依次排队 requests 中的 (客户端, 音色, 优先级)，然后释放名额，返回被接纳的顺序。
+    每个请求被接纳后立即释放，因此在容量为 1 时顺序即调度器的选择顺序。
+    """
+    order = []
+    blocker = scheduler.admit(*holder)
+    blocker.__enter__()
+
+    def run(request):
+        with scheduler.admit(*request):
+            order.append(request)
+
+    threads = []
+    for n, request in enumerate(requests, 1):
+        t = threading.Thread(target=run, args=(request,), daemon=True)
+        t.start()
+        threads.append(t)
+        # 逐个确认已排队，保证排队顺序确定
+        wait_until(lambda: queued(scheduler) == n)
+    blocker.__exit__(None, None, None)
+    for t in threads:
+        t.join(5)
+    return order
+
+
+def test_capacity_and_release():
+    scheduler = AdmissionScheduler(capacity=2, client_quota=2)
+    with scheduler.admit('a', 'v'), scheduler.admit('b', 'v'):
+        assert scheduler.stats()['running'] == 2
+        with pytest.raises(AdmissionRejected):
+            with scheduler.admit('c', 'v', timeout=0.05):
+                pass
+    assert scheduler.stats()['running'] == 0
+
+
+def test_timeout_removes_ticket_from_queue():
+    scheduler = AdmissionScheduler(capacity=1)
+    with scheduler.admit('a', 'v'):
+        with pytest.raises(AdmissionRejected):
+            with scheduler.admit('b', 'v', timeout=0.05):
+                pass
+        assert queued(scheduler) == 0
+        assert scheduler.stats()['classes'][PRIORITY_INTERACTIVE]['rejected'] == 1
+    # 超时的请求不会在名额释放后被接纳
+    assert scheduler.stats()['running'] == 0
+
+
+def test_interactive_before_bulk():
+    scheduler = AdmissionScheduler(capacity=1, client_quota=10)
+    requests = [('c1', 'v', PRIORITY_BULK), ('c2', 'v', PRIORITY_BULK),
+                ('c3', 'v', PRIORITY_INTERACTIVE), ('c4', 'v', PRIORITY_INTERACTIVE)]
+    order = admission_order(scheduler, requests)
+    assert [r[0] for r in order] == ['c3', 'c4', 'c1', 'c2']
+
+
+def test_fair_queueing_across_voices():
+    scheduler = AdmissionScheduler(capacity=1, client_quota=10)
+    requests = [(f'a{i}', 'a', PRIORITY_INTERACTIVE) for i in range(4)] + \
+               [(f'b{i}', 'b', PRIORITY_INTERACTIVE) for i in range(2)]
+    order = admission_order(scheduler, requests)
+    # 音色 a 的积压不会独占引擎：b 的请求与 a 交替被接纳，同一音色内保持先后顺序
+    assert [r[1] for r in order] == ['a', 'b', 'a', 'b', 'a', 'a']
+    assert [r[0] for r in order if r[1] == 'a'] == ['a0', 'a1', 'a2', 'a3']
+
+
+def test_voice_weights():
+    scheduler = AdmissionScheduler(capacity=1, client_quota=10, voice_weights={'a': 2})
+    requests = [(f'a{i}', 'a', PRIORITY_INTERACTIVE) for i in range(4)] + \
+               [(f'b{i}', 'b', PRIORITY_INTERACTIVE) for i in range(2)]
+    order = admission_order(scheduler, requests)
+    assert [r[1] for r in order][:3].count('a') == 2
+
+
+def test_client_quota_skips_busy_client():
+    scheduler = AdmissionScheduler(capacity=2, client_quota=1)
+    with scheduler.admit('busy', 'v'):
+        order = []
+        done = threading.Event()
+
+        def run(client):
+            with scheduler.admit(client, 'v', timeout=5):
+                order.append(client)
+                if client == 'busy':
+                    done.set()
+
+        busy = threading.Thread(target=run, args=('busy',), daemon=True)
+        busy.start()
+        wait_until(lambda: queued(scheduler) == 1)
+        # busy 已用满配额，排在它后面的其他客户端先被接纳
+        other = threading.Thread(target=run, args=('other',), daemon=True)
+        other.start()
+        other.join(5)
+        assert order == ['other']
+        assert not done.is_set()
+    busy.join(5)
+    assert order == ['other', 'busy']
+
+
+def test_queue_limit_and_unknown_priority():
+    scheduler = AdmissionScheduler(capacity=1, max_queue=1)
+    with scheduler.admit('a', 'v'):
+        def wait():
+            with scheduler.admit('b', 'v', timeout=5):
+                pass
+
+        waiter = threading.Thread(target=wait, daemon=True)
+        waiter.start()
+        wait_until(lambda: queued(scheduler) == 1)
+        with pytest.raises(AdmissionRejected):
+            with scheduler.admit('c', 'v'):
+                pass
+    waiter.join(5)
+    with pytest.raises(ValueError):
+        with scheduler.admit('a', 'v', priority='urgent'):
+            pass
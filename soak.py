@@ -0,0 +1,268 @@
+"""
+长时间压测与内存泄漏检测。
+
+    python soak.py --duration 14400 --max-growth-mb 50            # 进程内启动 API (桩引擎) 压测 4 小时
+    python soak.py --url http://127.0.0.1:5000 --pid 1234 ...     # 压测已运行的服务，只采样其 RSS
+                                                                  # 音色取自 --voices 或服务的 GET /voices
+
+压测期间定期采样 RSS 和 tracemalloc 快照 (仅进程内模式)。预热结束后的采样作为基线，
+结束时报告 RSS 增长量和增长斜率，并将 tracemalloc 中增长最多的分配位置列出，
+RSS 增长超过 --max-growth-mb 或请求错误率超过 --max-error-rate 时退出码为 1。
+"""
+import argparse
+import ctypes
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CORPUS = "你好世界今天天气很好我们一起去公园散步吧这是一个长时间运行的测试こんにちはテストですよろしくお願いします"
+# 进程内模式 (桩引擎) 使用的音色，桩引擎接受任意音色名
+STUB_VOICES = ('stub.phont', 'stub1', 'stub2.phont')
+
+
+def rss_bytes(pid: int = None) -> int:
+    """返回进程当前的常驻内存 (RSS / 工作集) 大小，单位为字节。"""
+    if os.name == 'nt':
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        kernel32 = ctypes.WinDLL('kernel32')
+        psapi = ctypes.WinDLL('psapi')
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        handle = kernel32.OpenProcess(0x1000, False, pid) if pid else kernel32.GetCurrentProcess()
+        if not handle:
+            raise OSError(f"无法打开进程 {pid}")
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            if not psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                raise OSError("GetProcessMemoryInfo 调用失败")
+        finally:
+            if pid:
+                kernel32.CloseHandle(handle)
+        return counters.WorkingSetSize
+
+    with open(f"/proc/{pid or 'self'}/status", 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    raise OSError("无法读取 VmRSS")
+
+
+def random_text(rng: random.Random) -> str:
+    start = rng.randrange(len(CORPUS) - 4)
+    return CORPUS[start:start + rng.randint(4, 30)] + rng.choice('。！？、')
+
+
+def fetch_voices(base_url: str) -> list:
+    """从服务的 GET /voices 获取可用的音色名。"""
+    url = urllib.parse.urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    try:
+        conn.request('GET', '/voices')
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise OSError(f"GET /voices 返回 {response.status}")
+        return [item['voice'] for item in json.loads(body.decode('utf-8'))]
+    finally:
+        conn.close()
+
+
+def drive(base_url: str, voices, stop: threading.Event, stats: dict, lock: threading.Lock, seed: int):
+    """单个压测线程：混合发送 /synthesize、/tts 和 /koe 请求。"""
+    rng = random.Random(seed)
+    url = urllib.parse.urlsplit(base_url)
+    while not stop.is_set():
+        voice = rng.choice(voices)
+        kind = rng.random()
+        if kind < 0.6:
+            method, path = 'POST', '/synthesize'
+            body = json.dumps({'text': random_text(rng), 'voice': voice, 'speed': rng.randint(80, 150)})
+        elif kind < 0.9:
+            # 少量固定文本，覆盖缓存命中路径
+            text = random_text(rng) if rng.random() < 0.5 else 'こんにちは'
+            method, path, body = 'GET', '/tts?' + urllib.parse.urlencode({'voice': voice, 'text': text}), None
+        else:
+            method, path = 'POST', '/koe'
+            body = json.dumps({'texts': [random_text(rng) for _ in range(rng.randint(1, 8))], 'voice': voice})
+        ok = False
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            conn.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+            conn.close()
+        except (OSError, http.client.HTTPException):
+            pass
+        with lock:
+            stats['requests'] += 1
+            stats['errors'] += not ok
+
+
+def start_local_server():
+    """在本进程中使用桩引擎启动 API 服务，返回 (服务地址, server)。"""
+    os.environ.setdefault('AQ_STUB_ENGINE', '1')
+    os.environ.setdefault('AQ_PRELOAD_VOICES', '')
+    from werkzeug.serving import make_server
+    import api
+    server = make_server('127.0.0.1', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='soak-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def slope_mb_per_hour(samples) -> float:
+    """对 (时间, RSS) 采样做最小二乘线性拟合，返回每小时的增长量 (MB)。"""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_m = sum(m for _, m in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not var:
+        return 0.0
+    cov = sum((t - mean_t) * (m - mean_m) for t, m in samples)
+    return cov / var * 3600 / (1024 * 1024)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AquesTalkPy 长时间压测与内存泄漏检测")
+    parser.add_argument('--url', help='压测已运行的服务；不指定时在本进程中用桩引擎启动服务')
+    parser.add_argument('--pid', type=int, help='指定 --url 时必需，采样该服务进程的 RSS')
+    parser.add_argument('--duration', type=float, default=3600, help='压测时长 (秒)')
+    parser.add_argument('--warmup', type=float, default=60, help='预热时长 (秒)，之后的第一次采样作为基线')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发压测线程数')
+    parser.add_argument('--interval', type=float, default=30, help='采样间隔 (秒)')
+    parser.add_argument('--max-growth-mb', type=float, default=50, help='允许的 RSS 增长上限 (MB)')
+    parser.add_argument('--voices', help='压测使用的音色 (逗号分隔)；默认进程内模式使用桩音色，'
+                                         '--url 模式使用服务 GET /voices 返回的全部音色')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='允许的请求错误率上限，超过时判定失败 (错误过多时压测的只是错误路径)')
+    parser.add_argument('--frames', type=int, default=4, help='tracemalloc 记录的调用栈深度')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='进程内模式下不启用 tracemalloc，只采样 RSS')
+    parser.add_argument('--top', type=int, default=10, help='报告增长最多的分配位置数量')
+    parser.add_argument('--report', help='将采样结果保存为 JSON 文件')
+    args = parser.parse_args(argv)
+    if args.url is not None and args.pid is None:
+        # 没有 pid 时只能采样压测客户端自身的 RSS，结果没有意义
+        parser.error('指定 --url 时必须通过 --pid 指定服务进程')
+    if args.url is None and args.pid is not None:
+        parser.error('--pid 只能与 --url 一起使用')
+
+    local = args.url is None
+    tracing = local and not args.no_tracemalloc
+    if tracing:
+        tracemalloc.start(args.frames)
+    if local:
+        base_url, server = start_local_server()
+        pid = None
+    else:
+        base_url, server, pid = args.url, None, args.pid
+
+    if args.voices:
+        voices = [v.strip() for v in args.voices.split(',') if v.strip()]
+    elif local:
+        voices = list(STUB_VOICES)
+    else:
+        try:
+            voices = fetch_voices(base_url)
+        except (OSError, http.client.HTTPException, ValueError, KeyError, TypeError) as e:
+            parser.error(f'无法从服务获取音色列表，请通过 --voices 指定: {e}')
+    if not voices:
+        parser.error('没有可用的音色，请通过 --voices 指定')
+    print(f"压测音色: {', '.join(voices)}")
+
+    stop = threading.Event()
+    stats = {'requests': 0, 'errors': 0}
+    lock = threading.Lock()
+    workers = [threading.Thread(target=drive, args=(base_url, voices, stop, stats, lock, seed), daemon=True)
+               for seed in range(args.concurrency)]
+    for w in workers:
+        w.start()
+
+    started = time.monotonic()
+    baseline_rss = baseline_snapshot = None
+    samples = []
+    try:
+        time.sleep(min(args.warmup, args.duration))
+        while True:
+            elapsed = time.monotonic() - started
+            if tracing and baseline_snapshot is None:
+                # 基线快照本身占用大量内存，先创建再采样 RSS，使其计入基线
+                baseline_snapshot = tracemalloc.take_snapshot()
+            rss = rss_bytes(pid)
+            if tracing:
+                # 扣除 tracemalloc 自身记录分配信息所用的内存，它会随压测时长增长
+                rss -= tracemalloc.get_tracemalloc_memory()
+            if baseline_rss is None:
+                baseline_rss = rss
+            samples.append((elapsed, rss))
+            with lock:
+                requests, errors = stats['requests'], stats['errors']
+            print(f"[{elapsed:8.0f}s] RSS={rss / 1048576:.1f}MB  增长={(rss - baseline_rss) / 1048576:+.1f}MB  "
+                  f"请求={requests}  错误={errors}")
+            if elapsed >= args.duration:
+                break
+            time.sleep(min(args.interval, max(0.0, args.duration - elapsed)))
+    except KeyboardInterrupt:
+        print("已中断，生成报告...")
+    finally:
+        stop.set()
+        for w in workers:
+            w.join(timeout=35)
+
+    growth_mb = (samples[-1][1] - baseline_rss) / 1048576 if samples else 0.0
+    slope = slope_mb_per_hour(samples)
+    print(f"\nRSS 增长: {growth_mb:+.1f}MB  (趋势 {slope:+.2f}MB/小时)  请求数: {stats['requests']}  错误数: {stats['errors']}")
+
+    top = []
+    if tracing and baseline_snapshot is not None:
+        diff = tracemalloc.take_snapshot().compare_to(baseline_snapshot, 'traceback')
+        print(f"\n增长最多的 {args.top} 个分配位置:")
+        for stat in diff[:args.top]:
+            if stat.size_diff <= 0:
+                break
+            print(f"  {stat.size_diff / 1024:+.1f}KB ({stat.count_diff:+d} 块)")
+            for line in stat.traceback.format(limit=args.frames):
+                print(f"    {line}")
+            top.append({'size_diff': stat.size_diff, 'count_diff': stat.count_diff,
+                        'traceback': stat.traceback.format(limit=args.frames)})
+        tracemalloc.stop()
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'samples': samples, 'growth_mb': growth_mb, 'slope_mb_per_hour': slope,
+                       'stats': stats, 'top_growth': top}, f, ensure_ascii=False, indent=1)
+    if server is not None:
+        server.shutdown()
+
+    failed = False
+    if growth_mb > args.max_growth_mb:
+        print(f"失败: RSS 增长 {growth_mb:.1f}MB 超过上限 {args.max_growth_mb}MB")
+        failed = True
+    error_rate = stats['errors'] / stats['requests'] if stats['requests'] else 1.0
+    if error_rate > args.max_error_rate:
+        print(f"失败: 请求错误率 {error_rate:.1%} 超过上限 {args.max_error_rate:.1%}")
+        failed = True
+    if failed:
+        return 1
+    print("通过")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
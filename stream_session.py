@@ -0,0 +1,219 @@
+import os
+import sys
+import threading
+from collections import deque
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from text_to_ja import split_sentences
+from wav_utils import read_wav
+
+SENTENCE_ENDINGS = '。！？!?…\n'
+# 每个二进制帧的 PCM 字节数 (8kHz 16-bit 单声道约 256 毫秒)
+CHUNK_BYTES = 4096
+# 未确认的二进制帧上限，超过后暂停发送，直到客户端发送 ack
+WINDOW = 16
+
+
+class SentenceBuffer:
+    """增量文本的分句缓冲：逐段输入文本，返回其中已经完整的句子，未完成的部分留待后续输入。"""
+
+    def __init__(self, max_length: int = 100):
+        """
+        :param max_length: 每句允许的最大字符数，没有句末标点的文本超过该长度时也会被切出。
+        """
+        self.max_length = max_length
+        self.pending = ''
+
+    def feed(self, text: str) -> list:
+        self.pending += text
+        end = max(self.pending.rfind(ch) for ch in SENTENCE_ENDINGS)
+        # 句末标点可能连续出现 (如 "！？")，等到下一个非标点字符再切分
+        while end >= 0 and end + 1 == len(self.pending):
+            end = max(self.pending.rfind(ch, 0, end) for ch in SENTENCE_ENDINGS)
+        sentences = []
+        if end >= 0:
+            sentences = split_sentences(self.pending[:end + 1], self.max_length)
+            self.pending = self.pending[end + 1:]
+        if len(self.pending) > self.max_length:
+            # 过长且没有句末标点：输出除最后一段以外的部分，最后一段可能还会继续增长
+            parts = split_sentences(self.pending, self.max_length)
+            sentences.extend(parts[:-1])
+            self.pending = parts[-1] if parts else ''
+        return sentences
+
+    def flush(self) -> list:
+        """输入结束，返回剩余的全部文本。"""
+        sentences = split_sentences(self.pending, self.max_length)
+        self.pending = ''
+        return sentences
+
+    def clear(self):
+        self.pending = ''
+
+
+class StreamingSession:
+    """
+    流式合成会话：接收增量文本，每凑满一句立即在后台线程中合成，并将 PCM 数据分帧发送。
+    与传输层无关，WebSocket 路由只需把客户端消息交给 handle()，并提供 send 函数。
+
+    发送的消息 (dict 会被编码为 JSON 文本帧，bytes 为二进制帧)：
+        {'type': 'sentence', 'index', 'text', 'sample_rate', 'channels', 'sample_width', 'bytes'}
+        PCM 数据帧 (bytes) ...
+        {'type': 'sentence_end', 'index', 'seq'}   seq 为到目前为止发送的数据帧总数
+        {'type': 'error', 'index', 'error'}
+        {'type': 'cancelled'}                        此前发送的所有音频都应丢弃
+        {'type': 'end'}                              所有输入都已合成并发送完毕
+    """
+
+    def __init__(self, synthesize, send, max_length: int = 100,
+                 chunk_bytes: int = CHUNK_BYTES, window: int = WINDOW):
+        """
+        :param synthesize: 函数 sentence -> WAV 数据，由调用方绑定音色和参数。
+        :param send: 函数 message，message 为 dict (控制消息) 或 bytes (PCM 数据)。
+        :param max_length: 每句允许的最大字符数。
+        :param chunk_bytes: 每个数据帧的 PCM 字节数。
+        :param window: 未确认数据帧的上限，为 0 时不做流量控制。
+        """
+        self.synthesize = synthesize
+        self.send = send
+        self.buffer = SentenceBuffer(max_length)
+        self.chunk_bytes = chunk_bytes
+        self.window = window
+        self.sent = 0
+        self.acked = 0
+        self.next_index = 0
+        self.finished = threading.Event()
+        self._generation = 0
+        self._queue = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name='stream-session', daemon=True)
+        self._worker.start()
+
+    def handle(self, message: dict):
+        """
+        处理一条客户端控制消息: text / flush / cancel / ack / end。
+        :raises ValueError: 消息不是对象、类型未知或字段的类型不正确。
+        """
+        if not isinstance(message, dict):
+            raise ValueError("消息必须是 JSON 对象")
+        kind = message.get('type')
+        if kind == 'text':
+            text = message.get('text') or ''
+            if not isinstance(text, str):
+                raise ValueError("text 必须是字符串")
+            self._enqueue(self.buffer.feed(text))
+        elif kind == 'flush':
+            self._enqueue(self.buffer.flush())
+        elif kind == 'cancel':
+            self.cancel()
+        elif kind == 'ack':
+            try:
+                seq = int(message.get('seq', 0))
+            except (TypeError, ValueError):
+                raise ValueError("seq 必须是整数")
+            with self._cond:
+                self.acked = max(self.acked, seq)
+                self._cond.notify_all()
+        elif kind == 'end':
+            self._enqueue(self.buffer.flush())
+            with self._cond:
+                self._queue.append(('end', self._generation, None))
+                self._cond.notify_all()
+        else:
+            raise ValueError(f"未知的消息类型: {kind}")
+
+    def _enqueue(self, sentences):
+        with self._cond:
+            for sentence in sentences:
+                self._queue.append(('sentence', self._generation, (self.next_index, sentence)))
+                self.next_index += 1
+            self._cond.notify_all()
+
+    def cancel(self):
+        """丢弃尚未发送的文本和音频。正在合成的句子无法中断，其结果会被丢弃。"""
+        self.buffer.clear()
+        with self._cond:
+            self._generation += 1
+            self._queue.clear()
+            self._queue.append(('cancel', self._generation, None))
+            # 已发送的帧不再需要确认，避免流量控制阻塞后续句子
+            self.acked = self.sent
+            self._cond.notify_all()
+
+    def close(self):
+        """结束会话 (例如客户端断开)，停止后台线程。"""
+        with self._cond:
+            self._closed = True
+            self._generation += 1
+            self._queue.clear()
+            self._cond.notify_all()
+        self._worker.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                kind, generation, payload = self._queue.popleft()
+            try:
+                if kind == 'cancel':
+                    self.send({'type': 'cancelled'})
+                elif kind == 'end':
+                    self.send({'type': 'end'})
+                    self.finished.set()
+                    return
+                else:
+                    self._send_sentence(generation, *payload)
+            except Exception:
+                # 发送失败说明连接已断开
+                self.finished.set()
+                return
+
+    def _current(self, generation: int) -> bool:
+        return generation == self._generation and not self._closed
+
+    def _send_sentence(self, generation: int, index: int, sentence: str):
+        try:
+            wav = self.synthesize(sentence)
+            params, frames = read_wav(wav)
+        except Exception as e:
+            if self._current(generation):
+                self.send({'type': 'error', 'index': index, 'error': str(e)})
+            return
+        if not self._current(generation):
+            return
+        self.send({
+            'type': 'sentence', 'index': index, 'text': sentence,
+            'sample_rate': params.framerate, 'channels': params.nchannels,
+            'sample_width': params.sampwidth, 'bytes': len(frames),
+        })
+        view = memoryview(frames)
+        for start in range(0, len(frames), self.chunk_bytes):
+            with self._cond:
+                while self.window and self.sent - self.acked >= self.window and self._current(generation):
+                    self._cond.wait()
+                if not self._current(generation):
+                    return
+                self.sent += 1
+            self.send(bytes(view[start:start + self.chunk_bytes]))
+        self.send({'type': 'sentence_end', 'index': index, 'seq': self.sent})
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    from main import AquesSynthesizer
+
+    synth = AquesSynthesizer('stub', 'stub', '.', '.')
+
+    def show(message):
+        print(f"<binary {len(message)} bytes>" if isinstance(message, bytes) else message)
+
+    session = StreamingSession(lambda s: synth.synthesize(s), show, window=0)
+    # 模拟逐个 token 到达的聊天回复
+    for token in ['こんにち', 'は。きょうは', 'いい', 'てんきですね！', 'さんぽに', 'いこう']:
+        session.handle({'type': 'text', 'text': token})
+    session.handle({'type': 'end'})
+    session.finished.wait()
+    session.close()
@@ -0,0 +1,162 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from string import Formatter
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from text_to_ja import ChineseToHiragana
+from wav_utils import read_wav, make_header, compact_silence, crossfade_join
+from deadline import Deadline
+
+
+class TemplateSynthesizer:
+    """
+    模板合成。对于 "ただいまの時刻は{time}です" 这类只有少量插槽变化的模板，
+    静态部分按 (音色, 文本, 参数) 合成一次后缓存为 PCM，每次请求只合成插槽中的动态文本，
+    再以短交叉淡化拼接，单次请求的合成耗时只与动态文本的长度有关。
+    插槽只能是简单的名称 (如 {time})，不支持属性/下标访问、转换 (!r) 和格式说明 (:>10)，
+    因此可以安全地渲染不可信的模板；{{ 和 }} 表示花括号本身。可以被多个线程共享。
+    """
+
+    def __init__(self, converter: ChineseToHiragana = None, crossfade_ms: int = 10, edge_ms: int = 20,
+                 max_fragments: int = 1024, max_length: int = None):
+        """
+        :param converter: 可选的文本转换器，用于转换含中文、英文的片段；为 None 时片段必须是日文。
+        :param crossfade_ms: 接缝处交叉淡化的时长 (毫秒)。
+        :param edge_ms: 每个片段去除首尾静音后保留的静音时长 (毫秒)。
+        :param max_fragments: 静态片段缓存的最大条数，超过后淘汰最久未使用的片段。
+        :param max_length: 渲染后文本 (静态部分与插槽值之和) 的最大字符数，None 表示不限制。
+        """
+        self.converter = converter
+        self.crossfade_ms = crossfade_ms
+        self.edge_ms = edge_ms
+        self.max_fragments = max_fragments
+        self.max_length = max_length
+        self._formatter = Formatter()
+        self._fragments = OrderedDict()
+        self._templates = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _parse(self, template: str) -> list:
+        parts = self._templates.get(template)
+        if parts is None:
+            # 格式错误 (如花括号不成对) 时 Formatter.parse 抛出 ValueError
+            parts = list(self._formatter.parse(template))
+            for _, field, spec, conversion in parts:
+                if field is None:
+                    continue
+                if not field.isidentifier():
+                    raise ValueError(f"模板插槽只能是简单名称: {{{field}}}")
+                if conversion or spec:
+                    raise ValueError(f"模板插槽不支持转换或格式说明: {{{field}}}")
+            with self._lock:
+                if len(self._templates) >= self.max_fragments:
+                    self._templates.clear()
+                self._templates[template] = parts
+        return parts
+
+    def _render_fragment(self, synth, text: str, speed, pitch, volume, deadline):
+        """合成一个片段，去除首尾静音后返回 (params, PCM 数据)；转换后没有可发音的内容时返回 None。"""
+        if self.converter is not None:
+            text = self.converter.convert(text, deadline)
+        if not text.strip():
+            return None
+        wav = synth.synthesize(text, speed=speed, pitch=pitch, volume=volume, deadline=deadline)
+        # max_pause_ms 取一个足够大的值，只去除首尾静音，保留片段内部的停顿
+        wav, _ = compact_silence(wav, max_pause_ms=60000, pad_ms=self.edge_ms)
+        return read_wav(wav)
+
+    def _static(self, synth, text: str, speed, pitch, volume, deadline):
+        key = (synth.engine, synth.voice, synth.voice_version, text, speed, pitch, volume)
+        with self._lock:
+            if key in self._fragments:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return self._fragments[key]
+            self.misses += 1
+        fragment = self._render_fragment(synth, text, speed, pitch, volume, deadline)
+        with self._lock:
+            self._fragments[key] = fragment
+            if len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def render(self, synth, template: str, values: dict = None, speed: int = 100, pitch: int = 100,
+               volume: int = 100, deadline: Deadline = None) -> bytes:
+        """
+        渲染模板并返回 WAV 数据。
+        :param synth: 目标音色的 AquesSynthesizer，调用方需保证渲染期间独占使用。
+        :param values: 插槽的值，例如 {'time': '3時15分'}。
+        :raises ValueError: 模板格式错误、缺少插槽的值、插槽的值不是字符串或整数、
+                            渲染结果超过 max_length 或为空。
+        """
+        values = values or {}
+        # 先解析全部插槽的值并检查长度，再进行任何合成
+        pieces = []
+        for literal, field, _, _ in self._parse(template):
+            if literal.strip():
+                pieces.append((True, literal))
+            if field is None:
+                continue
+            if field not in values:
+                raise ValueError(f"缺少模板参数: {field}")
+            value = values[field]
+            if isinstance(value, bool) or not isinstance(value, (str, int)):
+                raise ValueError(f"模板参数 {field} 必须是字符串或整数")
+            value = str(value)
+            if value.strip():
+                pieces.append((False, value))
+        if self.max_length is not None and sum(len(text) for _, text in pieces) > self.max_length:
+            raise ValueError(f"渲染后的文本超过 {self.max_length} 个字符")
+        if not pieces:
+            raise ValueError("模板渲染结果为空")
+
+        params = None
+        chunks = []
+
+        def add(fragment):
+            nonlocal params
+            if fragment is None:
+                return
+            fragment_params, frames = fragment
+            if params is None:
+                params = fragment_params
+            elif fragment_params[:3] != params[:3]:
+                raise ValueError(f"片段音频格式不一致: {fragment_params[:3]} != {params[:3]}")
+            chunks.append(frames)
+
+        for static, text in pieces:
+            if static:
+                add(self._static(synth, text, speed, pitch, volume, deadline))
+            else:
+                add(self._render_fragment(synth, text, speed, pitch, volume, deadline))
+
+        if not chunks:
+            raise ValueError("模板渲染结果为空")
+        pcm = crossfade_join(params, chunks, self.crossfade_ms)
+        return make_header(params.nchannels, params.sampwidth, params.framerate, len(pcm)) + pcm
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'fragments': len(self._fragments), 'hits': self.hits, 'misses': self.misses}
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    from main import AquesSynthesizer
+
+    templates = TemplateSynthesizer()
+    with AquesSynthesizer(
+        engine='aq2',
+        voice='aq_yukkuri.phont',
+        dll_base='.\\aqtk2',
+        dic_dir='.\\aq_dic'
+    ) as synth:
+        for hour, minute in [(3, 15), (3, 16), (3, 17)]:
+            wav = templates.render(synth, 'ただいまの時刻は{hour}時{minute}分です。',
+                                   {'hour': hour, 'minute': minute})
+            with open(f'time_{hour}_{minute}.wav', 'wb') as f:
+                f.write(wav)
+    print(templates.stats())
@@ -6,6 +6,8 @@
 from pypinyin import pinyin, Style
 from pykakasi import kakasi
 import regex as re
+from user_dict import UserDictionary
+from deadline import Deadline
 
 
 class ChineseToHiragana:
@@ -15,9 +17,14 @@ class ChineseToHiragana:
     并对英文和标点进行优化处理，以实现最高程度的语音保真度。
     """
 
-    def __init__(self):
+    def __init__(self, user_dict: UserDictionary = None):
+        """
+        :param user_dict: 可选的用户词典，命中的短语直接使用词典中的读音，
+                          优先于拼音和英文转换。
+        """
         # 初始化 pykakasi 转换器
         self._kakasi = kakasi()
+        self.user_dict = user_dict
 
         # 为语音合成保留的标点及其日文对应
         self.punctuation_map = {
@@ -101,22 +108,43 @@ class ChineseToHiragana:
         if len(eng_str) == 1:
             return self.english_letter_map.get(eng_str.upper(), '')
         else:
-            kakasi_inst = kakasi()
-            result = kakasi_inst.convert(eng_str)
+            result = self._kakasi.convert(eng_str)
             return ''.join([item['kana'] for item in result])
 
     def _katakana_to_hiragana(self, katakana_str: str) -> str:
         """将片假名字符串转换为平假名"""
-        kakasi_inst = kakasi()
-        result = kakasi_inst.convert(katakana_str)
+        # 复用同一个 kakasi 实例：每次新建都会重新加载字典，既慢又会让内存持续上涨
+        result = self._kakasi.convert(katakana_str)
         return ''.join([item['hira'] for item in result])
 
-    def convert(self, text: str) -> str:
+    def convert(self, text: str, deadline: Deadline = None) -> str:
         """
         执行完整的多语言转换流程。
         :param text: 输入的混合文本字符串。
+        :param deadline: 可选的截止时间，转换过程中逐个词元检查。
         :return: 转换后的平假名字符串。
+        :raises DeadlineExceeded: 已超过截止时间或请求已被取消。
         """
+        katakana_parts = []
+        if self.user_dict:
+            # 先用用户词典一次性切分，命中的短语直接使用词典读音
+            for fragment, reading in self.user_dict.segment(text):
+                if reading is None:
+                    self._convert_fragment(fragment, katakana_parts, deadline)
+                else:
+                    katakana_parts.append(reading)
+        else:
+            self._convert_fragment(text, katakana_parts, deadline)
+
+        katakana_string = "".join(katakana_parts)
+
+        # 最终转换为平假名
+        hiragana_string = self._katakana_to_hiragana(katakana_string)
+
+        return hiragana_string
+
+    def _convert_fragment(self, text: str, katakana_parts: list, deadline: Deadline = None):
+        """将未命中用户词典的文本片段转换为片假名，结果追加到 katakana_parts。"""
         # 使用正则表达式将文本分割为中文、英文、标点和空格等部分
         # \p{Han} 匹配所有汉字
         # [a-zA-Z]+ 匹配英文单词
@@ -124,8 +152,9 @@ class ChineseToHiragana:
         # . 匹配任何其他字符（主要是标点）
         tokens = re.findall(r'(\p{Han}+|[a-zA-Z]+|[\p{Hiragana}\p{Katakana}ー]+|[。、！？…]|[\s]+|.)', text)
 
-        katakana_parts = []
         for token in tokens:
+            if deadline is not None:
+                deadline.check('convert')
             if re.fullmatch(r'\p{Han}+', token):
                 # 中文
                 pinyin_list = pinyin(token, style=Style.NORMAL, v_to_u=True)
@@ -147,12 +176,38 @@ class ChineseToHiragana:
             else:
                 continue
 
-        katakana_string = "".join(katakana_parts)
-
-        # 最终转换为平假名
-        hiragana_string = self._katakana_to_hiragana(katakana_string)
 
-        return hiragana_string
+def split_sentences(text: str, max_length: int = 100) -> list:
+    """
+    按句末标点将文本切分为句子，并保证每段不超过 max_length 个字符。
+    过长的句子优先在逗号处切分，仍然过长时按长度硬切分。
+    :param text: 输入文本。
+    :param max_length: 每段允许的最大字符数。
+    :return: 切分后的非空文本段列表。
+    """
+    segments = []
+    for sentence in re.findall(r'[^。！？!?…\n]+[。！？!?…]*|[。！？!?…]+', text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_length:
+            segments.append(sentence)
+            continue
+        current = ''
+        for clause in re.findall(r'[^、，,]+[、，,]*|[、，,]+', sentence):
+            while len(clause) > max_length:
+                if current:
+                    segments.append(current)
+                    current = ''
+                segments.append(clause[:max_length])
+                clause = clause[max_length:]
+            if len(current) + len(clause) > max_length:
+                segments.append(current)
+                current = ''
+            current += clause
+        if current:
+            segments.append(current)
+    return [s for s in segments if s.strip()]
 
 
 # --- 使用示例 ---
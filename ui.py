@@ -10,6 +10,7 @@ from PyQt5.QtMultimedia import QSound
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from text_to_ja import ChineseToHiragana
 from main import AquesSynthesizer
+from pipeline import build_synthesis_pipeline, file_sink
 
 DIC_DIR = '.\\aq_dic'
 AQTK1_BASE = '.\\aqtk1'
@@ -23,6 +24,8 @@ class YukkuriWindow(QWidget):
         self.setWindowTitle("Yukkuri语音生成器 (PyQt5)")
         self.selected_voice = DEFAULT_AQ2_PHONT
         self.selected_engine = 'aq2'
+        # 预览生成的临时文件，在下次预览和关闭窗口时清理
+        self._preview_files = []
         self.init_ui()
 
     def init_ui(self):
@@ -167,13 +170,31 @@ class YukkuriWindow(QWidget):
                     pitch=self._get_int_from_edit(self.pitch_edit, 100, 50, 200),
                     volume=self._get_int_from_edit(self.volume_edit, 100, 0, 300)
                 )
+                self._cleanup_preview_files()
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as f:
                     f.write(wav)
                     temp_path = f.name
+                self._preview_files.append(temp_path)
                 QSound.play(temp_path)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"合成失败: {e}")
 
+    def _cleanup_preview_files(self):
+        remaining = []
+        for path in self._preview_files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # 仍在播放中 (Windows 下文件被占用)，下次再删除
+                remaining.append(path)
+        self._preview_files = remaining
+
+    def closeEvent(self, event):
+        self._cleanup_preview_files()
+        super().closeEvent(event)
+
     def generate_wav(self):
         text = self.text_edit.toPlainText().strip()
         if not text:
@@ -218,25 +239,20 @@ class YukkuriWindow(QWidget):
         if not dir_path:
             return
         try:
-            for idx, t in enumerate(texts, 1):
-                prefix = AquesSynthesizer.get_prefix(t)
-                filename = f"{prefix}_{idx}.wav"
-                save_path = os.path.join(dir_path, filename)
-                ja_text = ChineseToHiragana().convert(t)
-                with AquesSynthesizer(
-                        engine=self.selected_engine,
-                        voice=self.selected_voice,
-                        dll_base=AQTK2_BASE if self.selected_engine == "aq2" else AQTK1_BASE,
-                        dic_dir=DIC_DIR
-                ) as synth:
-                    wav = synth.synthesize(
-                        ja_text,
-                        speed=self._get_int_from_edit(self.speed_edit, 100, 50, 300),
-                        pitch=self._get_int_from_edit(self.pitch_edit, 100, 50, 200),
-                        volume=self._get_int_from_edit(self.volume_edit, 100, 0, 300)
-                    )
-                    with open(save_path, 'wb') as f:
-                        f.write(wav)
+            # 文本转换、合成与文件写入在流水线中重叠执行，文件名为 {前缀}_{序号}.wav
+            pipeline = build_synthesis_pipeline(
+                engine=self.selected_engine,
+                voice=self.selected_voice,
+                dll_base=AQTK2_BASE if self.selected_engine == "aq2" else AQTK1_BASE,
+                dic_dir=DIC_DIR,
+                sink=file_sink(dir_path),
+                speed=self._get_int_from_edit(self.speed_edit, 100, 50, 300),
+                pitch=self._get_int_from_edit(self.pitch_edit, 100, 50, 200),
+                volume=self._get_int_from_edit(self.volume_edit, 100, 0, 300)
+            )
+            errors = [item for item in pipeline.run(texts, ordered=True) if item.error is not None]
+            if errors:
+                raise errors[0].error
             QMessageBox.information(self, "完成", f"已批量生成 {len(texts)} 个WAV文件")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"批量合成失败: {e}")
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+from collections import deque
+
+
+class UserDictionary:
+    """
+    用户词典：将短语 (多音字词、品牌名、英文单词等) 映射为指定的片假名读音。
+    所有短语被编译为 Aho-Corasick 自动机，一次线性扫描即可找出全部匹配，
+    匹配结果按"最左最长"原则选取，互不重叠。
+    编译后的自动机可以保存为 JSON 文件，工作进程直接加载而无需重新构建。
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, entries: dict = None):
+        """
+        :param entries: 初始词条，{短语: 片假名读音}。
+        """
+        self.entries = {}
+        self._compiled = False
+        if entries:
+            self.update(entries)
+
+    def add(self, phrase: str, reading: str):
+        """添加或覆盖一个词条。"""
+        if not phrase:
+            raise ValueError("短语不能为空")
+        self.entries[phrase] = reading
+        self._compiled = False
+
+    def update(self, entries: dict):
+        """批量添加词条。"""
+        for phrase, reading in entries.items():
+            self.add(phrase, reading)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def digest(self) -> str:
+        """词条内容的指纹 (与添加顺序无关)，用于在词典变化后使依赖读音的缓存失效。"""
+        payload = json.dumps(self.entries, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def compile(self):
+        """根据当前词条构建 Aho-Corasick 自动机。"""
+        goto = [{}]
+        depth = [0]
+        reading = [None]
+        for phrase, value in self.entries.items():
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    depth.append(depth[state] + 1)
+                    reading.append(None)
+                state = nxt
+            reading[state] = value
+
+        # 广度优先计算失败链接，以及指向最近的终止状态的输出链接
+        fail = [0] * len(goto)
+        dict_link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                dict_link[nxt] = fail[nxt] if reading[fail[nxt]] is not None else dict_link[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._depth = depth
+        self._reading = reading
+        self._dict_link = dict_link
+        self._compiled = True
+
+    def segment(self, text: str) -> list:
+        """
+        将文本切分为 (片段, 读音) 列表。命中词典的片段读音为对应片假名，
+        未命中的片段读音为 None。
+        """
+        if not self.entries:
+            return [(text, None)] if text else []
+        if not self._compiled:
+            self.compile()
+
+        goto, fail, depth, reading, dict_link = \
+            self._goto, self._fail, self._depth, self._reading, self._dict_link
+
+        # 单次扫描：记录每个起点上最长的匹配
+        longest = {}
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            s = state if reading[state] is not None else dict_link[state]
+            while s:
+                longest[i + 1 - depth[s]] = (i + 1, reading[s])
+                s = dict_link[s]
+
+        # 按最左最长原则选取互不重叠的匹配
+        result = []
+        plain_start = 0
+        i = 0
+        while i < len(text):
+            match = longest.get(i)
+            if match is None:
+                i += 1
+                continue
+            if plain_start < i:
+                result.append((text[plain_start:i], None))
+            end, value = match
+            result.append((text[i:end], value))
+            i = plain_start = end
+        if plain_start < len(text):
+            result.append((text[plain_start:], None))
+        return result
+
+    def save(self, path: str):
+        """将词条和编译后的自动机保存为 JSON 文件。"""
+        if not self._compiled:
+            self.compile()
+        data = {
+            'version': self.FORMAT_VERSION,
+            'entries': self.entries,
+            'goto': self._goto,
+            'fail': self._fail,
+            'depth': self._depth,
+            'reading': self._reading,
+            'dict_link': self._dict_link,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str) -> 'UserDictionary':
+        """从 JSON 文件加载预编译的词典，无需重新构建自动机。"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"不支持的用户词典格式版本: {data.get('version')}")
+        inst = cls()
+        inst.entries = data['entries']
+        inst._goto = data['goto']
+        inst._fail = data['fail']
+        inst._depth = data['depth']
+        inst._reading = data['reading']
+        inst._dict_link = data['dict_link']
+        inst._compiled = True
+        return inst
+
+    @classmethod
+    def from_file(cls, path: str) -> 'UserDictionary':
+        """
+        从文本词条文件构建词典。每行一个词条，格式为 "短语<TAB>片假名"，
+        空行和以 # 开头的行会被忽略。
+        """
+        inst = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split('\t')
+                if len(parts) != 2:
+                    raise ValueError(f"用户词典第 {lineno} 行格式错误: {line}")
+                inst.add(parts[0].strip(), parts[1].strip())
+        inst.compile()
+        return inst
+
+
+# --- 使用示例 ---
+if __name__ == '__main__':
+    user_dict = UserDictionary({
+        '重庆': 'チョンチン',
+        'iPhone': 'アイフォーン',
+        '银行': 'インハン',
+        '银行卡': 'インハンカー',
+    })
+    for fragment, reading in user_dict.segment("我用iPhone在重庆办了银行卡。"):
+        print(f"{fragment!r} -> {reading}")
@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from user_dict import UserDictionary
+
+
+def brute_force(entries: dict, text: str) -> list:
+    """最左最长匹配的朴素实现，作为对照。"""
+    result = []
+    plain_start = i = 0
+    while i < len(text):
+        end = max((i + len(p) for p in entries if text.startswith(p, i)), default=None)
+        if end is None:
+            i += 1
+            continue
+        if plain_start < i:
+            result.append((text[plain_start:i], None))
+        result.append((text[i:end], entries[text[i:end]]))
+        i = plain_start = end
+    if plain_start < len(text):
+        result.append((text[plain_start:], None))
+    return result
+
+
+def test_segment_basic():
+    d = UserDictionary({'重庆': 'チョンチン', '银行': 'ギンコウ'})
+    assert d.segment('我在重庆的银行') == [('我在', None), ('重庆', 'チョンチン'), ('的', None), ('银行', 'ギンコウ')]
+    assert d.segment('') == []
+    assert UserDictionary().segment('abc') == [('abc', None)]
+
+
+def test_segment_leftmost_longest():
+    d = UserDictionary({'ab': 'X', 'abc': 'Y', 'bcd': 'Z', 'c': 'W'})
+    # 最左优先：从 a 开始的 abc 胜过从 b 开始的 bcd；同一起点取最长
+    assert d.segment('abcd') == [('abc', 'Y'), ('d', None)]
+    assert d.segment('xbcdc') == [('x', None), ('bcd', 'Z'), ('c', 'W')]
+
+
+def test_segment_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(500):
+        entries = {''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))): str(n) for n in range(rng.randint(1, 8))}
+        text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 30)))
+        assert UserDictionary(entries).segment(text) == brute_force(entries, text), (entries, text)
+
+
+def test_add_recompiles():
+    d = UserDictionary({'ab': 'X'})
+    assert d.segment('abc') == [('ab', 'X'), ('c', None)]
+    d.add('abc', 'Y')
+    assert d.segment('abc') == [('abc', 'Y')]
+    with pytest.raises(ValueError):
+        d.add('', 'Z')
+
+
+def test_save_load_round_trip(tmp_path):
+    d = UserDictionary({'重庆': 'チョンチン', '重庆银行': 'チョンチンギンコウ', 'iPhone': 'アイフォーン'})
+    path = str(tmp_path / 'dict.json')
+    d.save(path)
+    loaded = UserDictionary.load(path)
+    assert loaded.entries == d.entries
+    assert loaded.digest() == d.digest()
+    for text in ['重庆银行的iPhone', '重庆', '没有命中', '']:
+        assert loaded.segment(text) == d.segment(text)
+
+
+def test_load_rejects_other_format_version(tmp_path):
+    path = tmp_path / 'dict.json'
+    path.write_text('{"version": 999}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        UserDictionary.load(str(path))
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'dict.txt'
+    path.write_text('# 注释\n\n重庆\tチョンチン\n银行 \t ギンコウ\n', encoding='utf-8')
+    assert UserDictionary.from_file(str(path)).entries == {'重庆': 'チョンチン', '银行': 'ギンコウ'}
+    path.write_text('重庆 チョンチン\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='第 1 行'):
+        UserDictionary.from_file(str(path))
+
+
+def test_digest_ignores_insertion_order():
+    a = UserDictionary({'a': 'ア', 'b': 'ビ'})
+    b = UserDictionary({'b': 'ビ', 'a': 'ア'})
+    assert a.digest() == b.digest()
+    b.add('a', 'エー')
+    assert a.digest() != b.digest()
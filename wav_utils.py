@@ -0,0 +1,150 @@
+import audioop
+import io
+import struct
+import sys
+import wave
+from array import array
+
+
+def read_wav(wav_data: bytes):
+    """
+    解析内存中的 WAV 数据。
+
+    :param wav_data: WAV 格式的音频数据 (bytes)。
+    :return: (params, frames) 二元组，params 为 wave 模块的参数元组，frames 为 PCM 数据。
+    """
+    with io.BytesIO(wav_data) as wav_buffer:
+        with wave.open(wav_buffer, 'rb') as wf:
+            params = wf.getparams()
+            frames = wf.readframes(wf.getnframes())
+    return params, frames
+
+
+def make_wav(params, frames: bytes) -> bytes:
+    """将 PCM 数据与参数重新组合成完整的 WAV 数据。"""
+    with io.BytesIO() as wav_buffer:
+        with wave.open(wav_buffer, 'wb') as wf:
+            wf.setparams(params)
+            wf.writeframes(frames)
+        return wav_buffer.getvalue()
+
+
+def make_header(nchannels: int, sampwidth: int, framerate: int, data_size: int) -> bytes:
+    """生成 44 字节的标准 PCM WAV 头部。"""
+    block_align = nchannels * sampwidth
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, nchannels, framerate, framerate * block_align, block_align, sampwidth * 8,
+        b'data', data_size
+    )
+
+
+def concat_wavs(wavs, gap_ms: int = 0) -> bytes:
+    """
+    将格式相同的多段 WAV 数据首尾拼接为一段。只有一段时原样返回。
+    :param gap_ms: 相邻两段之间插入的静音时长 (毫秒)。
+    :raises ValueError: 各段的声道数、采样宽度或采样率不一致。
+    """
+    if len(wavs) == 1:
+        return wavs[0]
+    first = None
+    frames = []
+    for wav in wavs:
+        params, data = read_wav(wav)
+        if first is None:
+            first = params
+        elif params[:3] != first[:3]:
+            raise ValueError(f"音频格式不一致: {params[:3]} != {first[:3]}")
+        elif gap_ms > 0:
+            frames.append(silence(first, gap_ms))
+        frames.append(data)
+    return make_header(first.nchannels, first.sampwidth, first.framerate, sum(map(len, frames))) + b''.join(frames)
+
+
+def crossfade_join(params, chunks, crossfade_ms: int = 10) -> bytes:
+    """
+    依次拼接多段 PCM 数据，相邻两段在接缝处重叠 crossfade_ms 并做线性交叉淡化，避免接缝处的爆音。
+    只对 16-bit PCM 做淡化，其他采样宽度直接拼接。
+    """
+    if params.sampwidth != 2 or crossfade_ms <= 0:
+        return b''.join(chunks)
+    channels = params.nchannels
+    overlap = int(params.framerate * crossfade_ms / 1000) * channels
+    swap = sys.byteorder == 'big'
+    out = array('h')
+    for chunk in chunks:
+        samples = array('h', chunk)
+        if swap:
+            samples.byteswap()
+        n = min(overlap, len(out), len(samples)) // channels * channels
+        base = len(out) - n
+        frames = n // channels
+        for i in range(n):
+            t = (i // channels + 1) / (frames + 1)
+            out[base + i] = int(out[base + i] * (1 - t) + samples[i] * t)
+        out.extend(samples[n:] if n else samples)
+    if swap:
+        out.byteswap()
+    return out.tobytes()
+
+
+def silence(params, ms: int) -> bytes:
+    """生成指定时长的静音 PCM 数据 (8-bit 为无符号格式，静音值为 0x80)。"""
+    nframes = int(params.framerate * ms / 1000)
+    fill = b'\x80' if params.sampwidth == 1 else b'\x00'
+    return fill * (nframes * params.nchannels * params.sampwidth)
+
+
+def compact_silence(wav_data: bytes, threshold: int = 300, max_pause_ms: int = 300,
+                    pad_ms: int = 50, window_ms: int = 10):
+    """
+    去除首尾静音，并将中间过长的停顿压缩到 max_pause_ms。
+    以 window_ms 为窗口，用 audioop.rms 一次遍历 PCM 数据计算每个窗口的能量，
+    能量不超过 threshold 的窗口视为静音。适用于 AquesTalk 输出的 16-bit PCM。
+
+    :param threshold: 静音判定的 RMS 阈值。
+    :param max_pause_ms: 中间停顿保留的最大时长。
+    :param pad_ms: 首尾保留的静音时长，避免切掉起音和尾音。
+    :return: (处理后的 WAV 数据, 节省的字节数) 二元组。
+    """
+    params, frames = read_wav(wav_data)
+    frame_size = params.sampwidth * params.nchannels
+    window = max(1, int(params.framerate * window_ms / 1000)) * frame_size
+    view = memoryview(frames)
+
+    # 单次遍历：每个窗口的能量由 audioop 在 C 层计算
+    voiced = [audioop.rms(view[i:i + window], params.sampwidth) > threshold
+              for i in range(0, len(frames), window)]
+    if not any(voiced):
+        return wav_data, 0
+
+    first = voiced.index(True)
+    last = len(voiced) - 1 - voiced[::-1].index(True)
+    pad = max(0, int(pad_ms / window_ms))
+    max_pause = max(1, int(max_pause_ms / window_ms))
+
+    # 收集需要保留的窗口区间 [start, end)
+    spans = []
+    start = max(0, first - pad)
+    i = first
+    while i <= last:
+        if voiced[i]:
+            i += 1
+            continue
+        run_end = i
+        while not voiced[run_end]:
+            run_end += 1
+        if run_end - i > max_pause:
+            # 停顿过长：保留前后各一半，去掉中间部分
+            head = max_pause // 2
+            spans.append((start, i + head))
+            start = run_end - (max_pause - head)
+        i = run_end
+    spans.append((start, min(len(voiced), last + 1 + pad)))
+
+    compacted = b''.join(view[s * window:e * window] for s, e in spans)
+    saved = len(frames) - len(compacted)
+    if not saved:
+        return wav_data, 0
+    return make_wav(params, compacted), saved